@@ -0,0 +1,258 @@
+"""Асинхронные представления для чтения рецептов, справочников и профилей.
+
+В Django 3.2 нет асинхронного ORM, поэтому каждый запрос к БД
+выполняется через sync_to_async в отдельном потоке со своим
+соединением. Независимые запросы запускаются одновременно
+через asyncio.gather.
+"""
+import asyncio
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from api.authentication import CachedTokenAuthentication
+from api.filters import NameFilterSet, RecipeFilter
+from api.metrics import QueryRecorder, current_metrics
+from api.pagination import LimitPagination
+from api.relations import get_request_relations
+from api.renderers import dumps
+from api.serializers import (IngredientSerializer, RecipeReadSerializer,
+                             TagSerializer, UserSerializer)
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag, User
+
+
+def in_thread(function):
+    """Синхронная функция как корутина, выполняемая в пуле потоков."""
+
+    def run(*args, **kwargs):
+        metrics = current_metrics.get()
+        try:
+            if metrics is None:
+                return function(*args, **kwargs)
+            with connection.execute_wrapper(QueryRecorder(metrics)):
+                return function(*args, **kwargs)
+        finally:
+            connection.close_if_unusable_or_obsolete()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        dumps(data), content_type='application/json', status=status
+    )
+
+
+@in_thread
+def get_token_user(key):
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return None
+    return user
+
+
+class InvalidPage(Http404):
+    pass
+
+
+def authentication_required():
+    return json_response(
+        {'detail': 'Учетные данные не были предоставлены.'}, 401
+    )
+
+
+def read_only_view(view):
+    """GET-представление с аутентификацией по токену и ответами в JSON."""
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(('GET', 'HEAD'))
+        request.user = AnonymousUser()
+        header = request.headers.get('Authorization', '').split()
+        if header and header[0] == 'Token':
+            user = await get_token_user(header[-1])
+            if len(header) != 2 or user is None:
+                return json_response(
+                    {'detail': 'Недопустимый токен.'}, status=401
+                )
+            request.user = user
+        try:
+            return await view(request, *args, **kwargs)
+        except InvalidPage:
+            return json_response({'detail': 'Неправильная страница'}, 404)
+        except Http404:
+            return json_response({'detail': 'Страница не найдена.'}, 404)
+
+    return wrapper
+
+
+@in_thread
+def fetch(queryset):
+    return list(queryset)
+
+
+@in_thread
+def fetch_one(queryset, **lookup):
+    instance = queryset.filter(**lookup).first()
+    if instance is None:
+        raise Http404
+    return instance
+
+
+@in_thread
+def prefetch(instances, *lookups):
+    prefetch_related_objects(instances, *lookups)
+
+
+@in_thread
+def filter_queryset(filterset):
+    """Проверка параметров фильтра; её запросы тоже идут в потоке."""
+    if not filterset.is_valid():
+        return None
+    return filterset.qs
+
+
+@in_thread
+def serialize(serializer_class, instance, request, many=False):
+    started = time.perf_counter()
+    data = serializer_class(
+        instance, many=many, context={'request': request}
+    ).data
+    metrics = current_metrics.get()
+    if metrics is not None:
+        metrics.serializer_time += time.perf_counter() - started
+    return data
+
+
+async def load_recipes(recipes, request):
+    """Одновременная загрузка связей рецептов и связей пользователя."""
+    await asyncio.gather(
+        prefetch(recipes, 'tags'),
+        prefetch(recipes, Prefetch(
+            'recipe_ingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        )),
+        in_thread(get_request_relations)(request),
+    )
+
+
+def get_page(request):
+    """Номер и размер страницы по правилам LimitPagination."""
+    page = request.GET.get('page', '1')
+    limit = request.GET.get(LimitPagination.page_size_query_param, '')
+    page = int(page) if page.isdigit() and int(page) > 0 else None
+    if page is None:
+        raise InvalidPage
+    if limit.isdigit() and int(limit) > 0:
+        return page, int(limit)
+    return page, LimitPagination.page_size
+
+
+@read_only_view
+async def recipe_list(request):
+    filterset = RecipeFilter(
+        request.GET, queryset=Recipe.objects.all(), request=request
+    )
+    queryset = await filter_queryset(filterset)
+    if queryset is None:
+        # ErrorList хранит сообщения вне самого списка.
+        return json_response({
+            name: list(errors) for name, errors in filterset.errors.items()
+        }, 400)
+    page, limit = get_page(request)
+    offset = (page - 1) * limit
+    count, recipes = await asyncio.gather(
+        in_thread(queryset.count)(),
+        fetch(queryset.select_related('author')[offset:offset + limit]),
+    )
+    if not recipes and page > 1:
+        raise InvalidPage
+    await load_recipes(recipes, request)
+    url = request.build_absolute_uri()
+    return json_response({
+        'count': count,
+        'next': replace_query_param(url, 'page', page + 1)
+        if offset + limit < count else None,
+        'previous': None if page == 1 else (
+            remove_query_param(url, 'page') if page == 2
+            else replace_query_param(url, 'page', page - 1)
+        ),
+        'results': await serialize(
+            RecipeReadSerializer, recipes, request, many=True
+        ),
+    })
+
+
+@read_only_view
+async def recipe_detail(request, pk):
+    recipe = await fetch_one(Recipe.objects.select_related('author'), pk=pk)
+    await load_recipes([recipe], request)
+    return json_response(
+        await serialize(RecipeReadSerializer, recipe, request)
+    )
+
+
+@read_only_view
+async def tag_list(request):
+    tags = await fetch(Tag.objects.all())
+    return json_response(
+        await serialize(TagSerializer, tags, request, many=True)
+    )
+
+
+@read_only_view
+async def tag_detail(request, pk):
+    tag = await fetch_one(Tag.objects.all(), pk=pk)
+    return json_response(await serialize(TagSerializer, tag, request))
+
+
+@read_only_view
+async def ingredient_list(request):
+    filterset = NameFilterSet(request.GET, queryset=Ingredient.objects.all())
+    queryset = await filter_queryset(filterset)
+    if queryset is None:
+        # ErrorList хранит сообщения вне самого списка.
+        return json_response({
+            name: list(errors) for name, errors in filterset.errors.items()
+        }, 400)
+    ingredients = await fetch(queryset)
+    return json_response(
+        await serialize(IngredientSerializer, ingredients, request, many=True)
+    )
+
+
+@read_only_view
+async def ingredient_detail(request, pk):
+    ingredient = await fetch_one(Ingredient.objects.all(), pk=pk)
+    return json_response(
+        await serialize(IngredientSerializer, ingredient, request)
+    )
+
+
+@read_only_view
+async def user_detail(request, pk):
+    if not request.user.is_authenticated:
+        return authentication_required()
+    profile, _ = await asyncio.gather(
+        fetch_one(User.objects.all(), pk=pk),
+        in_thread(get_request_relations)(request),
+    )
+    return json_response(await serialize(UserSerializer, profile, request))
+
+
+@read_only_view
+async def user_me(request):
+    if not request.user.is_authenticated:
+        return authentication_required()
+    return json_response(
+        await serialize(UserSerializer, request.user, request)
+    )
@@ -0,0 +1,77 @@
+import copy
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.cache import LocalCache
+
+local_tokens = LocalCache(
+    settings.AUTH_TOKEN_LOCAL_CACHE_SIZE, settings.AUTH_TOKEN_LOCAL_TTL
+)
+
+
+def get_token_key(key):
+    return f'auth:token:{key}'
+
+
+def get_generation_key(user_id):
+    return f'auth:user:{user_id}:generation'
+
+
+def get_generation(user_id):
+    """Поколение пользователя: время последнего сброса его токенов.
+
+    Пропавший из кэша ключ создаётся заново с новым значением,
+    поэтому записи со старым поколением не оживут.
+    """
+    key = get_generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time(), settings.AUTH_TOKEN_CACHE_TIMEOUT)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate_user_tokens(user_id):
+    """Немедленный сброс кэша всех токенов пользователя во всех процессах."""
+    cache.set(
+        get_generation_key(user_id), time.time(),
+        settings.AUTH_TOKEN_CACHE_TIMEOUT
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену с кэшем пользователя.
+
+    Пользователь ищется в кэше процесса, затем в общем кэше и только
+    потом в базе. Запись действительна, пока не сменилось поколение
+    её пользователя в общем кэше, поэтому выход, смена пароля
+    и блокировка действуют сразу во всех процессах. С кэшем в памяти
+    процесса (LocMemCache) сброс не дошёл бы до других процессов,
+    поэтому без общего CACHE_BACKEND пользователь читается из базы.
+    """
+
+    def authenticate_credentials(self, key):
+        if not settings.SHARED_CACHE:
+            return super().authenticate_credentials(key)
+        entry = local_tokens.get(key)
+        if entry is None:
+            entry = cache.get(get_token_key(key))
+        if entry is not None and entry[1] == get_generation(entry[0].pk):
+            local_tokens.set(key, entry)
+            user = copy.copy(entry[0])
+            return user, Token(key=key, user=user)
+        user_id = Token.objects.filter(key=key).values_list(
+            'user_id', flat=True
+        ).first()
+        # Поколение читается до пользователя: изменение, зафиксированное
+        # позже, сменит поколение и сделает эту запись недействительной.
+        generation = None if user_id is None else get_generation(user_id)
+        user, _ = super().authenticate_credentials(key)
+        entry = (user, generation)
+        cache.set(get_token_key(key), entry, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+        local_tokens.set(key, entry)
+        return copy.copy(user), Token(key=key, user=user)
@@ -0,0 +1,82 @@
+import threading
+from bisect import bisect_left, bisect_right
+
+from api.cache import get_catalogue_version
+from api.db import use_primary
+from recipes.models import Ingredient
+
+
+def normalize(name):
+    """Приведение названия к виду для поиска."""
+    return name.casefold().replace('ё', 'е').strip()
+
+
+class IngredientIndex:
+    """Отсортированный по названию индекс ингредиентов в памяти процесса.
+
+    Индекс перестраивается, когда меняется версия справочника
+    ингредиентов в кэше.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.entries = ([], [], '', [])
+        self.lock = threading.Lock()
+
+    def build(self, rows):
+        """Построение индекса из пар (id, название)."""
+        entries = sorted((normalize(name), pk) for pk, name in rows)
+        names = [name for name, _ in entries]
+        offsets = []
+        position = 0
+        for name in names:
+            offsets.append(position)
+            position += len(name) + 1
+        # Все названия одной строкой: поиск подстроки идёт через str.find.
+        self.entries = (
+            names, [pk for _, pk in entries], '\n'.join(names), offsets
+        )
+
+    def refresh(self):
+        version = get_catalogue_version('ingredients')
+        if version == self.version:
+            return
+        with self.lock:
+            if version != self.version:
+                with use_primary():
+                    self.build(Ingredient.objects.values_list(
+                        'id', 'name'
+                    ).iterator())
+                self.version = version
+
+    def match(self, query, limit):
+        """Id ингредиентов: сначала по префиксу, затем по подстроке."""
+        names, ids, text, offsets = self.entries
+        query = normalize(query)
+        start = bisect_left(names, query)
+        end = start
+        while (
+            end < len(names)
+            and end - start < limit
+            and names[end].startswith(query)
+        ):
+            end += 1
+        result = ids[start:end]
+        if not query or '\n' in query:
+            return result
+        found = text.find(query)
+        while found != -1 and len(result) < limit:
+            position = bisect_right(offsets, found) - 1
+            if not names[position].startswith(query):
+                result.append(ids[position])
+            if position + 1 == len(offsets):
+                break
+            found = text.find(query, offsets[position + 1])
+        return result
+
+    def search(self, query, limit):
+        self.refresh()
+        return self.match(query, limit)
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,44 @@
+import statistics
+import time
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def measure(function, arguments):
+    """Время вызова function с каждым из аргументов в миллисекундах."""
+    timings = []
+    for argument in arguments:
+        started = time.perf_counter()
+        function(argument)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def measure_runs(function, runs, warmup=1):
+    """Время runs вызовов function после прогрева в миллисекундах."""
+    for _ in range(warmup):
+        function()
+    return measure(lambda _: function(), range(runs))
+
+
+def summarize(timings):
+    return {
+        'p50': percentile(timings, 50),
+        'p95': percentile(timings, 95),
+        'p99': percentile(timings, 99),
+        'mean': statistics.mean(timings),
+    }
+
+
+def format_summary(timings, precision=1):
+    """Строка с перцентилями и средним для отчёта команды."""
+    summary = summarize(timings)
+    return (
+        f'p50={summary["p50"]:.{precision}f} мс, '
+        f'p95={summary["p95"]:.{precision}f} мс, '
+        f'p99={summary["p99"]:.{precision}f} мс, '
+        f'среднее={summary["mean"]:.{precision}f} мс'
+    )
@@ -0,0 +1,47 @@
+from django.db import transaction
+
+from api.relations import invalidate_relations
+from recipes.counters import recount_counters, suspend_counters
+
+
+def add_relations(user, model, foreign_key, ids, targets):
+    """Связи пользователя с объектами ids одним bulk_create.
+
+    targets - id объектов, которые существуют и доступны пользователю.
+    bulk_create не вызывает сигналы, поэтому счётчики и кэш связей
+    обновляются здесь же.
+    """
+    field = f'{foreign_key}_id'
+    existing = set(model.objects.filter(
+        user=user, **{f'{field}__in': ids}
+    ).values_list(field, flat=True))
+    created = [pk for pk in ids if pk in targets and pk not in existing]
+    if created:
+        model.objects.bulk_create(
+            [model(user=user, **{field: pk}) for pk in created],
+            ignore_conflicts=True
+        )
+        # Пересчёт, а не +1: параллельный запрос мог успеть раньше.
+        recount_counters(model, created)
+        user_id = user.id
+        transaction.on_commit(lambda: invalidate_relations(user_id))
+    statuses = {pk: 'created' for pk in created}
+    statuses.update({pk: 'exists' for pk in existing})
+    return [
+        {'id': pk, 'status': statuses.get(pk, 'not_found')} for pk in ids
+    ]
+
+
+def remove_relations(user, model, foreign_key, ids):
+    """Удаление связей пользователя с объектами ids одним DELETE."""
+    field = f'{foreign_key}_id'
+    queryset = model.objects.filter(user=user, **{f'{field}__in': ids})
+    deleted = set(queryset.values_list(field, flat=True))
+    if deleted:
+        with suspend_counters():
+            queryset.delete()
+        recount_counters(model, deleted)
+    return [
+        {'id': pk, 'status': 'deleted' if pk in deleted else 'not_found'}
+        for pk in ids
+    ]
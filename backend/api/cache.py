@@ -0,0 +1,277 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.db import use_primary
+
+# Как часто запрос без записи в кэше проверяет, не готов ли ответ.
+RESPONSE_CACHE_POLL_INTERVAL = 0.05
+
+
+class LocalCache:
+    """Ограниченный LRU-кэш в памяти процесса.
+
+    Если задан ttl, записи старше ttl секунд не возвращаются.
+    """
+
+    def __init__(self, max_size, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+# Срок жизни ограничивает устаревание с LocMemCache, где смена версии
+# не видна другим процессам.
+local_cache = LocalCache(
+    settings.CATALOGUE_LOCAL_CACHE_SIZE, settings.CATALOGUE_LOCAL_CACHE_TTL
+)
+
+
+def get_catalogue_version(catalogue):
+    """Версия справочника: время его последнего изменения.
+
+    Версия хранится дольше помеченных ею записей; пропавшая версия
+    создаётся заново с текущим временем, и записи просто пересчитываются.
+    """
+    key = f'catalogue:{catalogue}:version'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time(), settings.CATALOGUE_VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_catalogue(catalogue):
+    """Смена версии делает недействительными все записи справочника."""
+    cache.set(
+        f'catalogue:{catalogue}:version', time.time(),
+        settings.CATALOGUE_VERSION_TIMEOUT
+    )
+
+
+def get_catalogue_versions(catalogues, created=None):
+    """Версии нескольких справочников за одно обращение к кэшу.
+
+    Отсутствующая версия создаётся со значением created,
+    по умолчанию - текущим временем.
+    """
+    keys = {f'catalogue:{catalogue}:version': catalogue
+            for catalogue in catalogues}
+    versions = cache.get_many(list(keys))
+    for key in keys.keys() - versions.keys():
+        cache.add(
+            key, created or time.time(), settings.CATALOGUE_VERSION_TIMEOUT
+        )
+        versions[key] = cache.get(key)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def get_request_key(request):
+    """Ключ запроса: хост, путь и отсортированные параметры.
+
+    Хост нужен, потому что ссылки пагинации в ответе абсолютные.
+    """
+    params = sorted(
+        (name, value)
+        for name in request.query_params
+        for value in request.query_params.getlist(name)
+    )
+    return hashlib.md5(
+        f'{request.get_host()}{request.path}?{params}'.encode()
+    ).hexdigest()
+
+
+class CatalogueCacheMixin:
+    """Кэширование ответов справочников с поддержкой ETag."""
+
+    catalogue = None
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_cached_response(self, view, request, *args, **kwargs):
+        version = get_catalogue_version(self.catalogue)
+        key = (
+            f'catalogue:{self.catalogue}:{version}:'
+            f'{get_request_key(request)}'
+        )
+        entry = local_cache.get(key)
+        if entry is None:
+            entry = cache.get(key)
+        if entry is None:
+            with use_primary():
+                response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            content = json.dumps(
+                response.data, cls=JSONEncoder, sort_keys=True
+            ).encode()
+            entry = (response.data, quote_etag(
+                hashlib.md5(content).hexdigest()
+            ))
+            cache.set(key, entry, settings.CATALOGUE_CACHE_TIMEOUT)
+        local_cache.set(key, entry)
+        data, etag = entry
+        last_modified = int(version)
+        response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return get_conditional_response(
+            request, etag=etag, last_modified=last_modified,
+            response=response
+        )
+
+
+class AnonymousCacheMixin:
+    """Кэширование ответов list и retrieve для анонимных пользователей.
+
+    Запись помечается версиями справочников, от которых зависит
+    ответ (лента, рецепт, авторы, теги, ингредиенты), и считается
+    устаревшей, когда любая из них изменилась или истёк срок
+    свежести. Ответ пересчитывает один запрос под блокировкой:
+    остальные отдают устаревший ответ, а если записи нет - недолго
+    ждут пересчитанную.
+    """
+
+    cache_prefix = None
+    cache_query_params = ()
+    cache_catalogues = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.get_anonymous_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_anonymous_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def is_cacheable(self, request):
+        """Ссылки пагинации повторяют параметры запроса, поэтому
+        кэшируются только запросы без лишних и пустых параметров."""
+        return request.user.is_anonymous and all(
+            name in self.cache_query_params and all(
+                request.query_params.getlist(name)
+            )
+            for name in request.query_params
+        )
+
+    def get_cache_key(self, request):
+        return f'{self.cache_prefix}:{get_request_key(request)}'
+
+    def get_cache_catalogues(self, data):
+        """Справочники, от изменения которых зависит ответ."""
+        return self.cache_catalogues
+
+    def get_anonymous_response(self, view, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return view(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            data, etag, versions, fresh_until = entry
+            is_fresh = (
+                fresh_until > time.time()
+                and get_catalogue_versions(versions) == versions
+            )
+            if is_fresh:
+                return self.get_etag_response(request, data, etag)
+        locked = cache.add(
+            f'{key}:lock', True, settings.RESPONSE_CACHE_LOCK_TIMEOUT
+        )
+        if not locked:
+            # Ответ уже пересчитывает другой запрос: устаревший ответ
+            # отдаётся сразу, без записи недолго ждём пересчитанную.
+            if entry is None:
+                entry = self.wait_for_entry(key)
+            if entry is not None:
+                return self.get_etag_response(request, entry[0], entry[1])
+        started = time.time()
+        with use_primary():
+            response = view(request, *args, **kwargs)
+        if response.status_code != 200:
+            if locked:
+                cache.delete(f'{key}:lock')
+            return response
+        versions = get_catalogue_versions(
+            self.get_cache_catalogues(response.data), created=started
+        )
+        # Версии, изменённые или созданные во время расчёта ответа,
+        # делают запись устаревшей: её пересчитает следующий запрос.
+        versions = {
+            catalogue: min(version, started)
+            for catalogue, version in versions.items()
+        }
+        content = json.dumps(
+            response.data, cls=JSONEncoder, sort_keys=True
+        ).encode()
+        etag = quote_etag(hashlib.md5(content).hexdigest())
+        cache.set(
+            key,
+            (response.data, etag, versions,
+             time.time() + settings.RESPONSE_CACHE_TIMEOUT),
+            settings.RESPONSE_CACHE_TIMEOUT
+            + settings.RESPONSE_CACHE_STALE_TIMEOUT
+        )
+        if locked:
+            cache.delete(f'{key}:lock')
+        return self.get_etag_response(request, response.data, etag)
+
+    @staticmethod
+    def wait_for_entry(key):
+        """Запись, которую кэширует другой запрос, или None по таймауту."""
+        deadline = time.monotonic() + settings.RESPONSE_CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(RESPONSE_CACHE_POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry
+        return None
+
+    @staticmethod
+    def get_etag_response(request, data, etag):
+        response = Response(data)
+        response['ETag'] = etag
+        return get_conditional_response(
+            request, etag=etag, response=response
+        )
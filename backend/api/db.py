@@ -0,0 +1,109 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA = 'replica'
+
+# Включается на время GET-запросов к представлениям с ReplicaReadMixin.
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+def get_sticky_key(user_id):
+    return f'db:sticky:{user_id}'
+
+
+def mark_sticky(user_id):
+    """Чтение с основной базы, пока реплика не догнала запись."""
+    cache.set(
+        get_sticky_key(user_id), True, settings.DB_REPLICA_STICKY_SECONDS
+    )
+
+
+@contextmanager
+def use_primary():
+    """Чтение с основной базы для заполнения кэша под новой версией.
+
+    Версию меняет запись сразу после фиксации, а реплика может ещё
+    отдавать старые данные, которые иначе попали бы в кэш надолго.
+    """
+    token = read_from_replica.set(False)
+    try:
+        yield
+    finally:
+        read_from_replica.reset(token)
+
+
+def check_connections(**kwargs):
+    """Закрытие постоянных соединений, которые перестали отвечать.
+
+    Проверяются только соединения, простоявшие дольше
+    DB_CONN_HEALTH_CHECK_IDLE: обрыв после недавнего запроса маловероятен,
+    а SELECT 1 в каждом запросе стоит лишнего обмена с базой.
+    """
+    if not settings.DB_CONN_HEALTH_CHECKS:
+        return
+    idle_since = time.monotonic() - settings.DB_CONN_HEALTH_CHECK_IDLE
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if getattr(connection, 'last_used', 0) > idle_since:
+            continue
+        if not connection.is_usable():
+            connection.close()
+
+
+def mark_connections_used(**kwargs):
+    """Время последнего запроса через открытые соединения."""
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.last_used = now
+
+
+class ReplicaRouter:
+    """Чтение с реплики внутри ReplicaReadMixin, запись в основную базу."""
+
+    def db_for_read(self, model, **hints):
+        if read_from_replica.get() and REPLICA in settings.DATABASES:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
+
+
+class ReplicaReadMixin:
+    """GET-запросы ViewSet читают с реплики.
+
+    Пользователь, который недавно что-то изменил, читает
+    с основной базы, чтобы видеть свои изменения.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = read_from_replica.set(False)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            read_from_replica.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if REPLICA not in settings.DATABASES:
+            return
+        if request.method not in SAFE_METHODS:
+            return
+        user = request.user
+        if user.is_authenticated and cache.get(get_sticky_key(user.pk)):
+            return
+        read_from_replica.set(True)
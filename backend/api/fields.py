@@ -0,0 +1,34 @@
+import hashlib
+
+from django.core.files.storage import default_storage
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+from api.images import normalize_original
+from recipes.storage import HashedContentFile
+
+
+class HashedBase64ImageField(Base64ImageField):
+    """Изображение в base64 без EXIF, имя файла - хеш содержимого."""
+
+    def to_internal_value(self, base64_data):
+        file = super().to_internal_value(base64_data)
+        if file is None:
+            return None
+        content, extension = normalize_original(file)
+        digest = hashlib.sha256(content).hexdigest()
+        return HashedContentFile(content, f'{digest}.{extension}', digest)
+
+
+class RenditionsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные копии изображения."""
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        renditions = {}
+        for rendition, name in (value or {}).items():
+            url = default_storage.url(name)
+            renditions[rendition] = (
+                request.build_absolute_uri(url) if request else url
+            )
+        return renditions
@@ -1,30 +1,59 @@
+from django.db.models import Case, When
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe, Tag, User
+from api.autocomplete import ingredient_index
+from api.search import search_recipes
+from recipes.constants import (INGREDIENTS_SEARCH_LIMIT,
+                               INGREDIENTS_SEARCH_MAX_LIMIT)
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart, Tag,
+                            User)
 
 
 class NameFilterSet(FilterSet):
     """Фильтр для названия ингредиентов."""
 
-    name = filters.CharFilter(lookup_expr='istartswith')
+    name = filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
 
+    def get_limit(self):
+        limit = self.data.get('limit', '')
+        if not limit.isdigit() or int(limit) < 1:
+            return INGREDIENTS_SEARCH_LIMIT
+        return min(int(limit), INGREDIENTS_SEARCH_MAX_LIMIT)
+
+    def filter_name(self, queryset, name, value):
+        """Подсказки: совпадения по началу названия, затем по подстроке."""
+        ids = ingredient_index.search(value, self.get_limit())
+        if not ids:
+            return queryset.none()
+        return queryset.filter(pk__in=ids).order_by(
+            Case(*(When(pk=pk, then=position)
+                   for position, pk in enumerate(ids)))
+        )
+
 
 class RecipeFilter(FilterSet):
-    """Фильтрация рецептов."""
+    """Фильтрация рецептов.
+
+    Теги, избранное и корзина проверяются полусоединением
+    pk IN (подзапрос), поэтому JOIN не размножает строки рецептов
+    и DISTINCT не нужен.
+    """
 
     author = filters.ModelMultipleChoiceFilter(
         queryset=User.objects.all(),
-        field_name='author__username',
+        field_name='author',
+        distinct=False,
         label='Автор'
     )
     tags = filters.ModelMultipleChoiceFilter(
         queryset=Tag.objects.all(),
         field_name='tags__slug',
         to_field_name='slug',
+        method='filter_tags',
         label='Тэги'
     )
     is_favorited = filters.BooleanFilter(
@@ -35,6 +64,10 @@ class RecipeFilter(FilterSet):
         method='check_in_cartshop',
         label='В корзине покупок'
     )
+    search = filters.CharFilter(
+        method='filter_search',
+        label='Поиск по названию, описанию и ингредиентам'
+    )
 
     class Meta:
         model = Recipe
@@ -42,17 +75,35 @@ class RecipeFilter(FilterSet):
             'author',
             'tags',
             'is_favorited',
-            'is_in_shopping_cart'
+            'is_in_shopping_cart',
+            'search'
         )
 
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(pk__in=Recipe.tags.through.objects.filter(
+            tag__in=value
+        ).values('recipe'))
+
     def check_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value and self.request.user.is_authenticated:
-            return queryset.filter(favorites__user=user)
+            return queryset.filter(pk__in=Favorite.objects.filter(
+                user=user
+            ).values('recipe'))
         return queryset
 
     def check_in_cartshop(self, queryset, name, value):
         user = self.request.user
         if value and self.request.user.is_authenticated:
-            return queryset.filter(shopping_cart__user=user)
+            return queryset.filter(pk__in=ShoppingCart.objects.filter(
+                user=user
+            ).values('recipe'))
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск, результаты по убыванию релевантности."""
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
@@ -0,0 +1,104 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from api.cache import get_catalogue_versions
+from api.db import use_primary
+from api.relations import get_request_relations
+from recipes.models import Recipe, RecipeIngredient
+
+
+def get_fragment_catalogues(recipe):
+    """Справочники, от которых зависит фрагмент рецепта."""
+    return (
+        f'recipe:{recipe.pk}', f'user:{recipe.author_id}', 'tags',
+        'ingredients'
+    )
+
+
+def get_fragment_key(recipe, host, versions):
+    """Ключ фрагмента: рецепт, хост ссылок на картинки и версии."""
+    state = [host] + [
+        versions[catalogue] for catalogue in get_fragment_catalogues(recipe)
+    ]
+    return f'fragment:recipe:{recipe.pk}:' + hashlib.md5(
+        str(state).encode()
+    ).hexdigest()
+
+
+def render_missing(recipe_ids, serializer_class, context):
+    """Фрагменты рецептов, которых нет в кэше.
+
+    Рецепты читаются заново уже после версий и с основной базы,
+    поэтому изменение, зафиксированное раньше, не попадёт под старую
+    версию.
+    """
+    recipes = Recipe.objects.filter(pk__in=recipe_ids).defer(
+        'search_vector'
+    ).select_related('author').prefetch_related(
+        'tags',
+        Prefetch(
+            'recipe_ingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        ),
+    )
+    with use_primary():
+        recipes = list(recipes)
+    for recipe in recipes:
+        recipe.is_favorited = recipe.is_in_shopping_cart = False
+        recipe.author.is_subscribed = False
+    return {
+        fragment['id']: fragment
+        for fragment in serializer_class(
+            recipes, many=True, context={'request': context['request']}
+        ).data
+    }
+
+
+def merge_flags(fragment, relations, user):
+    """Фрагмент с флагами текущего пользователя."""
+    data = dict(fragment)
+    data['is_favorited'] = data['id'] in relations['favorites']
+    data['is_in_shopping_cart'] = data['id'] in relations['shopping_cart']
+    author = dict(data['author'])
+    author['is_subscribed'] = (
+        author['id'] != user.pk and author['id'] in relations['following']
+    )
+    data['author'] = author
+    return data
+
+
+def render_recipes(recipes, serializer_class, context):
+    """Рецепты из готовых фрагментов, общих для всех пользователей.
+
+    Сериализуются только рецепты без актуального фрагмента,
+    для остальных в ответ добавляются лишь флаги пользователя.
+    """
+    request = context['request']
+    versions = get_catalogue_versions({
+        catalogue
+        for recipe in recipes
+        for catalogue in get_fragment_catalogues(recipe)
+    })
+    keys = {
+        recipe.pk: get_fragment_key(recipe, request.get_host(), versions)
+        for recipe in recipes
+    }
+    fragments = cache.get_many(list(keys.values()))
+    missing = [pk for pk, key in keys.items() if key not in fragments]
+    if missing:
+        rendered = render_missing(missing, serializer_class, context)
+        cache.set_many(
+            {keys[pk]: fragment for pk, fragment in rendered.items()},
+            settings.RECIPE_FRAGMENT_CACHE_TIMEOUT
+        )
+        fragments.update(
+            (keys[pk], fragment) for pk, fragment in rendered.items()
+        )
+    relations = get_request_relations(request)
+    return [
+        merge_flags(fragments[keys[recipe.pk]], relations, request.user)
+        for recipe in recipes if keys[recipe.pk] in fragments
+    ]
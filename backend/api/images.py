@@ -0,0 +1,154 @@
+import hashlib
+import io
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+
+from recipes.signals import renditions_updated
+from recipes.storage import HashedContentFile, release_file
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS,
+    thread_name_prefix='image-renditions'
+)
+
+EXTENSIONS = {
+    'WEBP': 'webp',
+    'JPEG': 'jpg',
+}
+# Форматы, в которых сохраняется исходное изображение.
+ORIGINAL_FORMATS = {
+    **EXTENSIONS,
+    'PNG': 'png',
+}
+
+
+def get_rendition_format():
+    if settings.IMAGE_RENDITION_FORMAT == 'WEBP' and not features.check(
+        'webp'
+    ):
+        return 'JPEG'
+    return settings.IMAGE_RENDITION_FORMAT
+
+
+def render(image, size, image_format):
+    """Уменьшенная копия без метаданных исходного файла."""
+    copy = image.copy()
+    copy.thumbnail((size, size), Image.LANCZOS)
+    buffer = io.BytesIO()
+    copy.save(
+        buffer, image_format, quality=settings.IMAGE_RENDITION_QUALITY
+    )
+    return buffer.getvalue()
+
+
+def normalize_original(file):
+    """Загруженное изображение без EXIF и не больше IMAGE_ORIGINAL_MAX_SIZE.
+
+    Выполняется в запросе: метаданные с координатами не должны попасть
+    на диск. Поворот из EXIF применяется к пикселям, из анимации
+    остаётся первый кадр. Возвращает содержимое и расширение.
+    """
+    file.seek(0)
+    image = Image.open(file)
+    image_format = image.format
+    size = settings.IMAGE_ORIGINAL_MAX_SIZE
+    # JPEG сразу декодируется в уменьшенном виде.
+    image.draft(image.mode, (size, size))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((size, size), Image.LANCZOS)
+    if image_format not in ORIGINAL_FORMATS:
+        image_format = 'PNG'
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L', 'CMYK'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(
+        buffer, image_format, quality=settings.IMAGE_ORIGINAL_QUALITY,
+        icc_profile=image.info.get('icc_profile')
+    )
+    return buffer.getvalue(), ORIGINAL_FORMATS[image_format]
+
+
+def make_renditions(model, pk, field_name, name):
+    """Построение копий изображения и сохранение их путей в модели."""
+    storage = model._meta.get_field(field_name).storage
+    image_format = get_rendition_format()
+    try:
+        with storage.open(name) as file:
+            image = ImageOps.exif_transpose(Image.open(file))
+            has_alpha = image_format == 'WEBP' and (
+                image.mode in ('RGBA', 'LA')
+                or 'transparency' in image.info
+            )
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+        renditions = {}
+        for rendition, size in settings.IMAGE_RENDITIONS.items():
+            content = render(image, size, image_format)
+            digest = hashlib.sha256(content).hexdigest()
+            path = posixpath.join(
+                posixpath.dirname(name),
+                'renditions',
+                f'{digest}.{EXTENSIONS[image_format]}'
+            )
+            if not storage.exists(path):
+                path = storage.save(
+                    path, HashedContentFile(content, path, digest)
+                )
+            renditions[rendition] = path
+        # Изображение могли заменить, пока строились копии.
+        if model.objects.filter(pk=pk, **{field_name: name}).update(
+            **{f'{field_name}_renditions': renditions}
+        ):
+            transaction.on_commit(lambda: renditions_updated.send(
+                sender=model, pk=pk
+            ))
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', name)
+    finally:
+        connection.close()
+
+
+def schedule_renditions(instance, field_name):
+    """Сброс старых копий и постановка изображения в очередь обработки."""
+    model = type(instance)
+    model.objects.filter(pk=instance.pk).update(
+        **{f'{field_name}_renditions': {}}
+    )
+    setattr(instance, f'{field_name}_renditions', {})
+    name = getattr(instance, field_name).name
+    if not name:
+        return
+    transaction.on_commit(lambda: executor.submit(
+        make_renditions, model, instance.pk, field_name, name
+    ))
+
+
+class RenditionsMixin:
+    """Обработка загруженных изображений сериализатора в фоне.
+
+    Декодирование, проверка и очистка исходного файла выполняются
+    в запросе полем HashedBase64ImageField, в фон уходят только копии.
+    """
+
+    rendition_fields = ()
+
+    def save(self, **kwargs):
+        previous = {
+            field_name: getattr(self.instance, field_name).name
+            for field_name in self.rendition_fields
+            if self.instance is not None
+        }
+        instance = super().save(**kwargs)
+        for field_name in self.rendition_fields:
+            if field_name not in self.validated_data:
+                continue
+            schedule_renditions(instance, field_name)
+            if previous.get(field_name) != getattr(instance, field_name).name:
+                release_file(previous.get(field_name))
+        return instance
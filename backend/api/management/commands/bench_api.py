@@ -0,0 +1,144 @@
+import json
+import time
+from itertools import combinations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.benchmarks import summarize
+from recipes.models import Ingredient, Recipe, Tag, User
+
+FILTERS = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+
+
+class Command(BaseCommand):
+    """Нагрузочный замер основных эндпоинтов API."""
+
+    help = (
+        'Бенчмарк API на текущей базе: p50/p95/p99 и число запросов к БД. '
+        'Данные можно подготовить командой generate_data'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--save', metavar='PATH',
+            help='Сохранить результаты как базовые в JSON'
+        )
+        parser.add_argument(
+            '--compare', metavar='PATH',
+            help='Сравнить с базовыми результатами из JSON'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=20,
+            help='Допустимый рост p95 при сравнении, %%'
+        )
+
+    def get_cases(self):
+        """Названия замеров и адреса запросов."""
+        user = User.objects.filter(
+            favorites__isnull=False,
+            shopping_cart__isnull=False,
+            following__isnull=False,
+        ).first()
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        recipe = Recipe.objects.values_list('id', 'author_id').first()
+        ingredient = Ingredient.objects.values_list('name', flat=True).first()
+        if None in (user, recipe, ingredient) or len(tags) < 2:
+            raise CommandError(
+                'Недостаточно данных, запустите generate_data'
+            )
+        params = {
+            'tags': f'tags={tags[0]}&tags={tags[1]}',
+            'author': f'author={recipe[1]}',
+            'is_favorited': 'is_favorited=1',
+            'is_in_shopping_cart': 'is_in_shopping_cart=1',
+        }
+        cases = {'recipes': '/api/recipes/'}
+        for size in range(1, len(FILTERS) + 1):
+            for names in combinations(FILTERS, size):
+                cases[f'recipes?{"&".join(names)}'] = (
+                    '/api/recipes/?'
+                    + '&'.join(params[name] for name in names)
+                )
+        cases.update({
+            'recipe_detail': f'/api/recipes/{recipe[0]}/',
+            'download_shopping_cart':
+                '/api/recipes/download_shopping_cart/',
+            'subscriptions': '/api/users/subscriptions/?recipes_limit=3',
+            'ingredients_search': f'/api/ingredients/?name={ingredient[:3]}',
+        })
+        return user, cases
+
+    def measure(self, client, url, runs, warmup):
+        for _ in range(warmup):
+            client.get(url)
+        timings = []
+        query_count = 0
+        for _ in range(runs):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                timings.append((time.perf_counter() - started) * 1000)
+            query_count += len(queries)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: статус {response.status_code}')
+        return {**summarize(timings), 'queries': query_count / runs}
+
+    def handle(self, *args, **options):
+        user, cases = self.get_cases()
+        client = APIClient(SERVER_NAME=settings.ALLOWED_HOSTS[0])
+        client.force_authenticate(user)
+        baseline = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)['results']
+        self.stdout.write(
+            f'Рецептов: {Recipe.objects.count()}, '
+            f'пользователей: {User.objects.count()}, '
+            f'прогонов: {options["runs"]}'
+        )
+        results = {}
+        regressions = []
+        for name, url in cases.items():
+            result = results[name] = self.measure(
+                client, url, options['runs'], options['warmup']
+            )
+            line = (
+                f'{name}: p50={result["p50"]:.1f} мс, '
+                f'p95={result["p95"]:.1f} мс, '
+                f'p99={result["p99"]:.1f} мс, '
+                f'запросов={result["queries"]:g}'
+            )
+            previous = baseline.get(name)
+            if previous:
+                change = (result['p95'] / previous['p95'] - 1) * 100
+                line += (
+                    f' (p95 {change:+.0f}%, '
+                    f'запросов было {previous["queries"]:g})'
+                )
+                if (
+                    change > options['threshold']
+                    or result['queries'] > previous['queries']
+                ):
+                    regressions.append(name)
+            self.stdout.write(line)
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'recipes': Recipe.objects.count(),
+                    'runs': options['runs'],
+                    'results': results,
+                }, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["save"]}')
+        if regressions:
+            raise CommandError(
+                f'Регрессия относительно {options["compare"]}: '
+                f'{", ".join(regressions)}'
+            )
@@ -0,0 +1,73 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.autocomplete import IngredientIndex, normalize
+from api.benchmarks import format_summary, measure
+
+SYLLABLES = (
+    'ба', 'ва', 'го', 'ду', 'же', 'зи', 'ка', 'ло', 'ми', 'но', 'па',
+    'ре', 'са', 'то', 'ук', 'фа', 'хе', 'це', 'чи', 'ша', 'ще', 'ю', 'я',
+)
+
+
+def generate_names(size, seed):
+    """Синтетические уникальные названия ингредиентов."""
+    generator = random.Random(seed)
+    names = set()
+    while len(names) < size:
+        words = (
+            ''.join(generator.choices(SYLLABLES, k=generator.randint(2, 4)))
+            for _ in range(generator.randint(1, 3))
+        )
+        names.add(' '.join(words))
+    return list(names)
+
+
+class Command(BaseCommand):
+    """Замер скорости подсказок по названию ингредиента."""
+
+    help = 'Бенчмарк поиска ингредиентов на синтетическом справочнике'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100_000)
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def report(self, title, timings):
+        self.stdout.write(f'{title}: {format_summary(timings, 3)}')
+
+    def handle(self, *args, **options):
+        names = generate_names(options['size'], options['seed'])
+        generator = random.Random(options['seed'])
+        queries = [
+            generator.choice(names)[:generator.randint(1, 5)]
+            for _ in range(options['queries'])
+        ]
+        limit = options['limit']
+
+        index = IngredientIndex()
+        started = time.perf_counter()
+        index.build(enumerate(names))
+        self.stdout.write(
+            f'Построение индекса на {len(names)} названий: '
+            f'{(time.perf_counter() - started) * 1000:.1f} мс'
+        )
+
+        self.report('Индекс', measure(
+            lambda query: index.match(query, limit), queries
+        ))
+
+        # Полный просмотр справочника, как при UPPER(name) LIKE без индекса.
+        normalized = [normalize(name) for name in names]
+
+        def scan(query):
+            query = normalize(query)
+            return sorted(
+                position for position, name in enumerate(normalized)
+                if name.startswith(query)
+            )[:limit]
+
+        self.report('Полный просмотр', measure(scan, queries))
@@ -0,0 +1,85 @@
+import statistics
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.benchmarks import measure_runs, percentile
+from api.serializers import RecipeReadSerializer
+from recipes.models import Recipe, RecipeIngredient, User
+
+
+class Command(BaseCommand):
+    """Сравнение сериализации рецептов с кэшем фрагментов и без него."""
+
+    help = (
+        'Скорость отрисовки страниц рецептов: RecipeReadSerializer '
+        'против готовых фрагментов с флагами пользователя'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=50)
+        parser.add_argument('--page-size', type=int, default=100)
+
+    def get_request(self):
+        user = User.objects.filter(favorites__isnull=False).first()
+        if user is None:
+            user = User.objects.first()
+        request = Request(APIRequestFactory().get(
+            '/api/recipes/', SERVER_NAME=settings.ALLOWED_HOSTS[0]
+        ))
+        request.user = user
+        return request
+
+    def measure(self, title, render, runs, page_size):
+        timings = measure_runs(render, runs)
+        self.stdout.write(
+            f'{title}: '
+            f'p50={percentile(timings, 50):.1f} мс, '
+            f'p95={percentile(timings, 95):.1f} мс, '
+            f'{page_size / statistics.mean(timings) * 1000:.0f} рецептов/с'
+        )
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        request = self.get_request()
+        if request.user is None:
+            raise CommandError('Нет пользователей, запустите generate_data')
+        recipes = list(Recipe.objects.defer('search_vector').select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        ).order_by('-published_date', '-id')[:page_size])
+        if not recipes:
+            raise CommandError('Нет рецептов, запустите generate_data')
+        pages = list(Recipe.objects.only(
+            'id', 'author', 'published_date'
+        ).order_by('-published_date', '-id')[:page_size])
+        self.stdout.write(f'Рецептов на странице: {len(recipes)}')
+
+        def serialize():
+            RecipeReadSerializer(
+                recipes, many=True, context={'request': request}
+            ).data
+
+        def fragments():
+            # Связи пользователя читаются в каждом запросе заново.
+            request.user_relations = None
+            RecipeReadSerializer(
+                pages, many=True,
+                context={'request': request, 'fragments': True}
+            ).data
+
+        self.measure(
+            'RecipeReadSerializer (связи уже загружены)', serialize,
+            options['runs'], len(recipes)
+        )
+        self.measure(
+            'Фрагменты из кэша', fragments, options['runs'], len(pages)
+        )
@@ -0,0 +1,108 @@
+import io
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.benchmarks import measure_runs, percentile
+from api.renderers import (FastJSONParser, FastJSONRenderer, orjson,
+                           stream_json_list)
+from api.serializers import IngredientSerializer, RecipeReadSerializer
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+
+class Command(BaseCommand):
+    """Сравнение JSON-рендереров и парсеров на данных API."""
+
+    help = (
+        'Кодирование страницы рецептов и всего списка ингредиентов, '
+        'разбор JSON и память при потоковой отдаче ингредиентов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=50)
+        parser.add_argument('--page-size', type=int, default=100)
+
+    def measure(self, title, function, runs):
+        timings = measure_runs(function, runs)
+        self.stdout.write(
+            f'  {title}: p50={percentile(timings, 50):.2f} мс, '
+            f'p95={percentile(timings, 95):.2f} мс'
+        )
+
+    def get_recipes(self, page_size):
+        recipes = Recipe.objects.defer('search_vector').select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        ).order_by('-published_date', '-id')[:page_size]
+        request = Request(APIRequestFactory().get(
+            '/api/recipes/', SERVER_NAME=settings.ALLOWED_HOSTS[0]
+        ))
+        return RecipeReadSerializer(
+            recipes, many=True, context={'request': request}
+        ).data
+
+    def compare(self, title, data, runs):
+        content = JSONRenderer().render(data)
+        self.stdout.write(f'{title} ({len(content) / 1024:.0f} КБ):')
+        for name, renderer in (
+            ('JSONRenderer', JSONRenderer()),
+            ('FastJSONRenderer', FastJSONRenderer()),
+        ):
+            self.measure(name, lambda: renderer.render(data), runs)
+        for name, parser in (
+            ('JSONParser', JSONParser()),
+            ('FastJSONParser', FastJSONParser()),
+        ):
+            self.measure(
+                name, lambda: parser.parse(io.BytesIO(content)), runs
+            )
+
+    def measure_memory(self, title, function):
+        tracemalloc.start()
+        started = time.perf_counter()
+        function()
+        elapsed = (time.perf_counter() - started) * 1000
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f'  {title}: {elapsed:.0f} мс, пик памяти {peak / 2 ** 20:.1f} МБ'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            'orjson: ' + ('установлен' if orjson else 'нет, стандартный json')
+        )
+        recipes = self.get_recipes(options['page_size'])
+        if not recipes:
+            raise CommandError('Нет рецептов, запустите generate_data')
+        self.compare(f'Рецепты, {len(recipes)} шт.', recipes, options['runs'])
+        ingredients = IngredientSerializer(
+            Ingredient.objects.all(), many=True
+        ).data
+        self.compare(
+            f'Ингредиенты, {len(ingredients)} шт.', ingredients,
+            max(options['runs'] // 10, 1)
+        )
+        self.stdout.write('Весь список ингредиентов из базы:')
+        self.measure_memory('список и JSONRenderer', lambda: (
+            JSONRenderer().render(IngredientSerializer(
+                Ingredient.objects.all(), many=True
+            ).data)
+        ))
+        self.measure_memory('stream_json_list', lambda: sum(
+            len(chunk) for chunk in stream_json_list(
+                IngredientSerializer(), Ingredient.objects.iterator()
+            )
+        ))
@@ -0,0 +1,72 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from api.benchmarks import format_summary, measure
+from api.matching import RecipeIngredientIndex
+from recipes.models import Recipe, RecipeIngredient
+
+
+class Command(BaseCommand):
+    """Замер подбора рецептов по ингредиентам."""
+
+    help = (
+        'Бенчмарк индекса what_can_i_cook на текущей базе; данные можно '
+        'подготовить командой generate_data --recipes 1000000'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--ingredients', type=int, default=10)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def get_queries(self, count, size, seed):
+        """Наборы из ингредиентов случайного рецепта и случайных добавок."""
+        generator = random.Random(seed)
+        bounds = Recipe.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            raise CommandError('Нет рецептов, запустите generate_data')
+        pks = range(bounds['first'], bounds['last'] + 1)
+        ingredients = {}
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=generator.sample(pks, min(count, len(pks)))
+        ).values_list('recipe_id', 'ingredient_id'):
+            ingredients.setdefault(recipe_id, []).append(ingredient_id)
+        if not ingredients:
+            raise CommandError('Нет ингредиентов в рецептах')
+        known = sorted({
+            ingredient_id
+            for items in ingredients.values() for ingredient_id in items
+        })
+        recipes = list(ingredients.values())
+        queries = []
+        for _ in range(count):
+            query = set(generator.choice(recipes))
+            while len(query) < size and len(query) < len(known):
+                query.add(generator.choice(known))
+            queries.append(query)
+        return queries
+
+    def handle(self, *args, **options):
+        index = RecipeIngredientIndex()
+        started = time.perf_counter()
+        index.rebuild(None, 0)
+        self.stdout.write(
+            f'Индекс построен за {time.perf_counter() - started:.1f} с, '
+            f'рецептов: {len(index.sizes) - 1}, '
+            f'ингредиентов: {len(index.postings)}, '
+            f'связей: {sum(map(len, index.postings.values()))}'
+        )
+        queries = self.get_queries(
+            options['queries'], options['ingredients'], options['seed']
+        )
+        timings = measure(
+            lambda query: index.match(query, options['limit']), queries
+        )
+        self.stdout.write(
+            f'what_can_i_cook ({options["ingredients"]} ингредиентов): '
+            f'{format_summary(timings)}'
+        )
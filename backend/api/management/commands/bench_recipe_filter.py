@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.http import QueryDict
+
+from api.benchmarks import measure_runs, percentile
+from api.filters import RecipeFilter
+from recipes.models import Recipe, Tag, User
+
+
+def legacy_queryset(user, params):
+    """Фильтрация в прежнем виде: JOIN по связям и DISTINCT."""
+    queryset = Recipe.objects.all()
+    if 'tags' in params:
+        condition = Q()
+        for slug in params.getlist('tags'):
+            condition |= Q(tags__slug=slug)
+        queryset = queryset.filter(condition).distinct()
+    if 'author' in params:
+        queryset = queryset.filter(
+            author__username=User.objects.get(pk=params['author'])
+        )
+    if params.get('is_favorited') == '1':
+        queryset = queryset.filter(favorites__user=user)
+    if params.get('is_in_shopping_cart') == '1':
+        queryset = queryset.filter(shopping_cart__user=user)
+    return queryset
+
+
+def measure(queryset, runs, page_size):
+    """Медиана и максимум времени подсчёта и выборки первой страницы."""
+    timings = measure_runs(
+        lambda: (queryset.count(), list(queryset[:page_size])),
+        runs, warmup=0
+    )
+    return percentile(timings, 50), max(timings)
+
+
+class Command(BaseCommand):
+    """Сравнение фильтрации рецептов через JOIN и через EXISTS."""
+
+    help = (
+        'Бенчмарк RecipeFilter на текущей базе; данные можно '
+        'подготовить командой generate_data'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=6)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(favorites__isnull=False).first()
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        author = Recipe.objects.values_list('author_id', flat=True).first()
+        if user is None or len(tags) < 2 or author is None:
+            raise CommandError(
+                'Недостаточно данных, запустите generate_data'
+            )
+        request = SimpleNamespace(user=user)
+        cases = (
+            f'tags={tags[0]}',
+            f'tags={tags[0]}&tags={tags[1]}',
+            f'author={author}',
+            'is_favorited=1',
+            'is_in_shopping_cart=1',
+            f'tags={tags[0]}&tags={tags[1]}&is_favorited=1',
+        )
+        self.stdout.write(
+            f'Рецептов в базе: {Recipe.objects.count()}, '
+            f'прогонов: {options["runs"]}'
+        )
+        for case in cases:
+            params = QueryDict(case)
+            before = measure(
+                legacy_queryset(user, params),
+                options['runs'], options['page_size']
+            )
+            after = measure(
+                RecipeFilter(
+                    params, queryset=Recipe.objects.all(), request=request
+                ).qs,
+                options['runs'], options['page_size']
+            )
+            self.stdout.write(
+                f'{case}: до {before[0]:.1f} мс (макс. {before[1]:.1f}), '
+                f'после {after[0]:.1f} мс (макс. {after[1]:.1f})'
+            )
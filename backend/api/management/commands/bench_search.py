@@ -0,0 +1,102 @@
+import random
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min, Q
+from django.http import QueryDict
+from django.utils.http import urlencode
+
+from api.benchmarks import format_summary, measure
+from api.filters import RecipeFilter
+from api.search import tokenize
+from recipes.models import Recipe, Tag, User
+
+
+def naive_queryset(value):
+    """Поиск без индекса: LIKE по названию и описанию."""
+    condition = Q()
+    for word in value.split():
+        condition &= Q(name__icontains=word) | Q(text__icontains=word)
+    return Recipe.objects.filter(condition)
+
+
+class Command(BaseCommand):
+    """Замер полнотекстового поиска рецептов."""
+
+    help = (
+        'Бенчмарк параметра search на текущей базе; данные можно '
+        'подготовить командой generate_data --recipes 1000000'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--naive', action='store_true',
+            help='Сравнить с поиском через LIKE без индекса'
+        )
+
+    def get_queries(self, count, seed):
+        """Запросы из одного и двух слов реальных рецептов."""
+        generator = random.Random(seed)
+        bounds = Recipe.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            raise CommandError('Нет рецептов, запустите generate_data')
+        pks = range(bounds['first'], bounds['last'] + 1)
+        texts = list(Recipe.objects.filter(
+            pk__in=generator.sample(pks, min(count, len(pks)))
+        ).values_list('name', 'text'))
+        if not texts:
+            raise CommandError('Нет рецептов, запустите generate_data')
+        queries = []
+        for _ in range(count):
+            words = [
+                word for word in tokenize(' '.join(generator.choice(texts)))
+                if not word.isdigit()
+            ]
+            queries.append(' '.join(generator.sample(
+                words, min(generator.randint(1, 2), len(words))
+            )))
+        return queries
+
+    def measure(self, title, make_queryset, queries, page_size):
+        # Первый запрос строит индекс в памяти, если база не PostgreSQL.
+        list(make_queryset(queries[0])[:page_size])
+
+        def run(query):
+            queryset = make_queryset(query)
+            queryset.count()
+            list(queryset[:page_size])
+
+        self.stdout.write(
+            f'{title}: {format_summary(measure(run, queries))}'
+        )
+
+    def handle(self, *args, **options):
+        queries = self.get_queries(options['queries'], options['seed'])
+        request = SimpleNamespace(user=User.objects.first())
+        tag = Tag.objects.values_list('slug', flat=True).first()
+        self.stdout.write(
+            f'Рецептов в базе: {Recipe.objects.count()}, '
+            f'запросов: {len(queries)}'
+        )
+
+        def search(query, **params):
+            return RecipeFilter(
+                QueryDict(urlencode({'search': query, **params})),
+                queryset=Recipe.objects.all(), request=request
+            ).qs
+
+        self.measure('search', search, queries, options['page_size'])
+        if tag:
+            self.measure(
+                f'search + tags={tag}',
+                lambda query: search(query, tags=tag),
+                queries, options['page_size']
+            )
+        if options['naive']:
+            self.measure(
+                'LIKE без индекса', naive_queryset,
+                queries, options['page_size']
+            )
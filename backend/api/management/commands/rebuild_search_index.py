@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from api.search import update_search_vectors
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Пересчёт поискового индекса рецептов."""
+
+    help = (
+        'Пересчёт tsvector всех рецептов пачками; без PostgreSQL '
+        'сбрасывает индекс в памяти процессов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        last = 0
+        updated = 0
+        while True:
+            ids = list(Recipe.objects.filter(pk__gt=last).order_by(
+                'pk'
+            ).values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            update_search_vectors(
+                Recipe.objects.filter(pk__gt=last, pk__lte=ids[-1])
+            )
+            last = ids[-1]
+            updated += len(ids)
+        self.stdout.write(f'Поисковый индекс обновлён: {updated}')
@@ -0,0 +1,146 @@
+import heapq
+import threading
+from array import array
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from api.cache import get_catalogue_version
+from api.db import use_primary
+from recipes.models import Recipe, RecipeIngredient
+
+JOURNAL_SEQUENCE_KEY = 'matching:journal'
+
+
+def get_journal_key(sequence):
+    return f'matching:journal:{sequence}'
+
+
+def record_recipe_change(recipe_id):
+    """Запись об изменении ингредиентов рецепта в общий журнал."""
+    cache.add(JOURNAL_SEQUENCE_KEY, 0, None)
+    sequence = cache.incr(JOURNAL_SEQUENCE_KEY)
+    cache.set(
+        get_journal_key(sequence), recipe_id, settings.MATCHING_JOURNAL_TIMEOUT
+    )
+
+
+class RecipeIngredientIndex:
+    """Инвертированный индекс «ингредиент -> рецепты» в памяти процесса.
+
+    Базовая часть - отсортированные массивы id рецептов по каждому
+    ингредиенту и массив числа ингредиентов рецепта. Рецепты,
+    изменённые после построения, лежат в небольшом словаре поверх
+    неё: процесс дочитывает их из общего журнала изменений и
+    перестраивает индекс, когда словарь разрастается или журнал
+    потерял записи.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.sequence = 0
+        self.postings = {}
+        self.sizes = array('H')
+        self.overrides = {}
+        self.lock = threading.Lock()
+
+    def build(self, rows):
+        """Построение из пар (ингредиент, рецепт), упорядоченных по паре."""
+        postings = defaultdict(lambda: array('I'))
+        sizes = Counter()
+        for ingredient_id, recipe_id in rows:
+            postings[ingredient_id].append(recipe_id)
+            sizes[recipe_id] += 1
+        sizes_array = array('H', bytes(2 * (max(sizes, default=0) + 1)))
+        for recipe_id, size in sizes.items():
+            sizes_array[recipe_id] = size
+        self.postings, self.sizes, self.overrides = (
+            dict(postings), sizes_array, {}
+        )
+
+    def rebuild(self, version, sequence):
+        self.build(RecipeIngredient.objects.order_by(
+            'ingredient_id', 'recipe_id'
+        ).values_list('ingredient_id', 'recipe_id').iterator())
+        self.version = version
+        self.sequence = sequence
+
+    def apply(self, recipe_ids):
+        """Текущие ингредиенты изменённых рецептов поверх базы индекса."""
+        ingredients = {recipe_id: frozenset() for recipe_id in recipe_ids}
+        existing = set(Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).values_list('pk', flat=True))
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=existing
+        ).values_list('recipe_id', 'ingredient_id'):
+            ingredients[recipe_id] |= {ingredient_id}
+        for recipe_id in recipe_ids:
+            self.overrides[recipe_id] = (
+                ingredients[recipe_id] if recipe_id in existing else None
+            )
+
+    def refresh(self):
+        version = get_catalogue_version('recipe_matching')
+        sequence = cache.get(JOURNAL_SEQUENCE_KEY, 0)
+        if version == self.version and sequence == self.sequence:
+            return
+        with self.lock, use_primary():
+            if version != self.version or sequence < self.sequence:
+                self.rebuild(version, sequence)
+                return
+            if sequence == self.sequence:
+                return
+            changes = cache.get_many([
+                get_journal_key(number)
+                for number in range(self.sequence + 1, sequence + 1)
+            ])
+            if (
+                len(changes) < sequence - self.sequence
+                or len(self.overrides) + len(changes)
+                > settings.MATCHING_MAX_OVERRIDES
+            ):
+                self.rebuild(version, sequence)
+                return
+            self.apply(set(changes.values()))
+            self.sequence = sequence
+
+    def match(self, ingredient_ids, limit):
+        """Рецепты с наибольшим покрытием набора ингредиентов.
+
+        Возвращает тройки (id рецепта, совпало, всего) по возрастанию
+        числа недостающих ингредиентов, затем по убыванию совпавших
+        и от новых рецептов к старым, и число всех кандидатов.
+        """
+        ingredient_ids = set(ingredient_ids)
+        postings, sizes, overrides = self.postings, self.sizes, self.overrides
+        counts = Counter()
+        for ingredient_id in ingredient_ids:
+            counts.update(postings.get(ingredient_id, ()))
+        totals = {}
+        for recipe_id, ingredients in overrides.items():
+            counts.pop(recipe_id, None)
+            if ingredients and ingredients & ingredient_ids:
+                counts[recipe_id] = len(ingredients & ingredient_ids)
+                totals[recipe_id] = len(ingredients)
+        candidates = (
+            (
+                (totals.get(recipe_id) or sizes[recipe_id]) - matched,
+                -matched, -recipe_id
+            )
+            for recipe_id, matched in counts.items()
+        )
+        return [
+            (-negative_id, -negative_matched, missing - negative_matched)
+            for missing, negative_matched, negative_id in heapq.nsmallest(
+                limit, candidates
+            )
+        ], len(counts)
+
+    def search(self, ingredient_ids, limit):
+        self.refresh()
+        return self.match(ingredient_ids, limit)
+
+
+recipe_ingredient_index = RecipeIngredientIndex()
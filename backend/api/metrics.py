@@ -0,0 +1,267 @@
+import bisect
+import hmac
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.serializers import ListSerializer
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм в единицах метрики.
+SECONDS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+BYTES_BUCKETS = (
+    1024, 4096, 16384, 65536, 262144, 1048576, 4194304
+)
+
+# Показатели текущего запроса для кода, который выполняется
+# в других потоках (асинхронные представления).
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+class RequestMetrics:
+    """Показатели одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.view = None
+        self.action = None
+        # Запросы к БД уже учитываются в этом потоке.
+        self.recording = False
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus с накопительными корзинами."""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [
+                    [0] * (len(self.buckets) + 1), 0.0
+                ]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        with self.lock:
+            series = [
+                (labels, list(counts), total)
+                for labels, (counts, total) in self.series.items()
+            ]
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield (
+                    f'{self.name}_bucket{{{labels},le="{bound}"}} '
+                    f'{cumulative}'
+                )
+            yield f'{self.name}_sum{{{labels}}} {total}'
+            yield f'{self.name}_count{{{labels}}} {cumulative}'
+
+
+class Counter:
+    """Счётчик в формате Prometheus."""
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels, value=1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + value
+
+    def render(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        with self.lock:
+            series = list(self.series.items())
+        for labels, value in series:
+            yield f'{self.name}{{{labels}}} {value}'
+
+
+request_duration = Histogram(
+    'foodgram_request_duration_seconds',
+    'Время обработки запроса', SECONDS_BUCKETS
+)
+db_queries = Histogram(
+    'foodgram_db_queries', 'Количество запросов к БД за запрос',
+    QUERIES_BUCKETS
+)
+db_duration = Histogram(
+    'foodgram_db_duration_seconds', 'Время запросов к БД за запрос',
+    SECONDS_BUCKETS
+)
+serializer_duration = Histogram(
+    'foodgram_serializer_duration_seconds', 'Время сериализации ответа',
+    SECONDS_BUCKETS
+)
+response_size = Histogram(
+    'foodgram_response_size_bytes', 'Размер тела ответа', BYTES_BUCKETS
+)
+requests_total = Counter(
+    'foodgram_requests_total', 'Количество запросов по статусам'
+)
+slow_queries_total = Counter(
+    'foodgram_slow_queries_total', 'Количество медленных запросов к БД'
+)
+
+METRICS = (
+    request_duration, db_queries, db_duration, serializer_duration,
+    response_size, requests_total, slow_queries_total,
+)
+
+
+def format_labels(**labels):
+    return ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for name, value in labels.items()
+    )
+
+
+def render_metrics():
+    """Все метрики процесса в текстовом формате Prometheus."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def has_metrics_access(request):
+    """Запрос с токеном METRICS_TOKEN; без настроенного токена доступа нет."""
+    token = settings.METRICS_TOKEN
+    return bool(token) and hmac.compare_digest(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    )
+
+
+class QueryRecorder:
+    """Обёртка запросов к БД: количество, время и медленные запросы."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.metrics.queries += 1
+            self.metrics.db_time += duration
+            if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD:
+                slow_queries_total.inc(
+                    format_labels(alias=context['connection'].alias)
+                )
+                # Параметры не пишутся: в них токены и хэши паролей.
+                logger.warning(
+                    'Медленный запрос %.1f мс: %s', duration * 1000, sql
+                )
+
+
+@contextmanager
+def record_queries(metrics):
+    """Учёт запросов всех соединений текущего потока."""
+    recorder = QueryRecorder(metrics)
+    metrics.recording = True
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            yield
+    finally:
+        metrics.recording = False
+
+
+def timed_to_representation(serializer_class):
+    """to_representation, которое учитывает время сериализации.
+
+    Вложенные вызовы (объекты списка) уже входят во время внешнего.
+    """
+    to_representation = serializer_class.to_representation
+
+    def wrapper(serializer, instance):
+        metrics = getattr(serializer.context.get('request'), 'metrics', None)
+        if metrics is None or metrics.serializing:
+            return to_representation(serializer, instance)
+        metrics.serializing = True
+        started = time.perf_counter()
+        try:
+            return to_representation(serializer, instance)
+        finally:
+            metrics.serializer_time += time.perf_counter() - started
+            metrics.serializing = False
+
+    return wrapper
+
+
+@lru_cache(maxsize=None)
+def get_timed_class(serializer_class):
+    """Подкласс сериализатора с учётом времени, в том числе для many=True."""
+    attrs = {
+        '__module__': serializer_class.__module__,
+        '__qualname__': serializer_class.__qualname__,
+        'to_representation': timed_to_representation(serializer_class),
+    }
+    if not issubclass(serializer_class, ListSerializer):
+        meta = getattr(serializer_class, 'Meta', None)
+        attrs['Meta'] = type('Meta', (meta,) if meta else (), {
+            'list_serializer_class': get_timed_class(getattr(
+                meta, 'list_serializer_class', ListSerializer
+            )),
+        })
+    return type(serializer_class.__name__, (serializer_class,), attrs)
+
+
+class MetricsMixin:
+    """Подпись метрик запроса именем ViewSet и действием,
+    учёт времени сериализации."""
+
+    def dispatch(self, request, *args, **kwargs):
+        metrics = getattr(request, 'metrics', None)
+        if metrics is None or metrics.recording:
+            return super().dispatch(request, *args, **kwargs)
+        # Под ASGI синхронное представление выполняется в другом потоке,
+        # и его запросы middleware не видит.
+        with record_queries(metrics):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        metrics = getattr(request, 'metrics', None)
+        if metrics is not None:
+            metrics.view = type(self).__name__
+            metrics.action = self.action
+
+    def get_serializer(self, *args, **kwargs):
+        # get_serializer_class переопределяют сами ViewSet.
+        serializer_class = get_timed_class(self.get_serializer_class())
+        kwargs.setdefault('context', self.get_serializer_context())
+        return serializer_class(*args, **kwargs)
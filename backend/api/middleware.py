@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+from api import metrics as request_metrics
+from api.db import REPLICA, mark_sticky
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """Сбор показателей запроса и заголовок Server-Timing.
+
+    Server-Timing раскрывает время работы сервера, поэтому отдаётся
+    только при DEBUG или запросу с токеном метрик.
+
+    Работает и в синхронной, и в асинхронной цепочке обработки.
+    """
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        metrics = request.metrics = request_metrics.RequestMetrics()
+        token = request_metrics.current_metrics.set(metrics)
+        try:
+            with request_metrics.record_queries(metrics):
+                response = self.get_response(request)
+        finally:
+            request_metrics.current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        """Запросы к БД считаются там, где выполняется код: в потоках
+        асинхронных представлений и в MetricsMixin.dispatch."""
+        metrics = request.metrics = request_metrics.RequestMetrics()
+        token = request_metrics.current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_metrics.current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        duration = time.perf_counter() - metrics.started
+        if settings.DEBUG or request_metrics.has_metrics_access(request):
+            response['Server-Timing'] = ', '.join((
+                f'db;dur={metrics.db_time * 1000:.1f};'
+                f'desc="{metrics.queries} queries"',
+                f'serializer;dur={metrics.serializer_time * 1000:.1f}',
+                f'total;dur={duration * 1000:.1f}',
+            ))
+        self.record(request, response, metrics, duration)
+        return response
+
+    def record(self, request, response, metrics, duration):
+        view = metrics.view
+        action = metrics.action or request.method.lower()
+        if view is None:
+            match = request.resolver_match
+            view = match.view_name if match else 'unresolved'
+            action = request.method.lower()
+        labels = request_metrics.format_labels(view=view, action=action)
+        request_metrics.requests_total.inc(
+            request_metrics.format_labels(
+                view=view, action=action, status=response.status_code
+            )
+        )
+        request_metrics.request_duration.observe(labels, duration)
+        request_metrics.db_queries.observe(labels, metrics.queries)
+        request_metrics.db_duration.observe(labels, metrics.db_time)
+        if metrics.serializer_time:
+            request_metrics.serializer_duration.observe(
+                labels, metrics.serializer_time
+            )
+        if not response.streaming:
+            request_metrics.response_size.observe(
+                labels, len(response.content)
+            )
+
+
+class ReadYourWritesMiddleware(MiddlewareMixin):
+    """Закрепление пользователя за основной базой после изменений."""
+
+    def process_response(self, request, response):
+        if (
+            REPLICA in settings.DATABASES
+            and request.method not in ('GET', 'HEAD', 'OPTIONS')
+            and response.status_code < 400
+            and request.user.is_authenticated
+        ):
+            mark_sticky(request.user.pk)
+        return response
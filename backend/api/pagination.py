@@ -1,6 +1,85 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from recipes.constants import INGREDIENTS_PAGE_MAX_SIZE, INGREDIENTS_PAGE_SIZE
 
 
 class LimitPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+
+class OptionalPagePagination(PageNumberPagination):
+    """Пагинация только для запросов с page или page_size.
+
+    Без них отдаётся весь список, как раньше; limit остаётся
+    ограничением подсказок фильтра по названию.
+    """
+
+    page_size = INGREDIENTS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = INGREDIENTS_PAGE_MAX_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if (
+            self.page_query_param not in params
+            and self.page_size_query_param not in params
+        ):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class LimitCursorPagination(CursorPagination):
+    """Пагинация по курсору без подсчёта общего количества.
+
+    Количество записей считается, только если передан count=true.
+    """
+
+    page_size = 6
+    page_size_query_param = 'limit'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(
+            self.count_query_param, ''
+        ).lower() in ('1', 'true'):
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data = OrderedDict(
+                count=self.count, **response.data
+            )
+        return response
+
+
+class RecipeCursorPagination(LimitCursorPagination):
+    ordering = ('-published_date', '-id')
+
+
+class SubscriptionCursorPagination(LimitCursorPagination):
+    ordering = ('username', 'id')
+
+
+class CursorPaginationMixin:
+    """Включение пагинации по курсору параметром pagination=cursor."""
+
+    cursor_pagination_classes = {}
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            cursor_class = self.cursor_pagination_classes.get(self.action)
+            if cursor_class is not None and (
+                params.get('pagination') == 'cursor' or 'cursor' in params
+            ):
+                self._paginator = cursor_class()
+            else:
+                return super().paginator
+        return self._paginator
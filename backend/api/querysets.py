@@ -0,0 +1,44 @@
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from recipes.models import Recipe
+
+SHORT_RECIPE_FIELDS = (
+    'id', 'name', 'image', 'image_renditions', 'cooking_time', 'author'
+)
+
+
+def get_latest_recipes(author_ids, limit=None):
+    """Последние рецепты каждого автора одним запросом.
+
+    При заданном limit рецепты нумеруются ROW_NUMBER() в разрезе
+    автора, и из каждого окна берутся первые limit строк. Django 3.2
+    не умеет фильтровать по оконным выражениям, поэтому запрос
+    оборачивается во внешний SELECT через raw().
+    """
+    result = defaultdict(list)
+    if not author_ids:
+        return result
+    recipes = Recipe.objects.filter(
+        author__in=author_ids
+    ).only(*SHORT_RECIPE_FIELDS)
+    if limit is not None:
+        sql, params = recipes.annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('published_date').desc(), F('id').desc()),
+            )
+        ).query.sql_with_params()
+        row_number = connection.ops.quote_name('row_number')
+        recipes = Recipe.objects.raw(
+            f'SELECT * FROM ({sql}) AS windowed '
+            f'WHERE {row_number} <= %s ORDER BY author_id, {row_number}',
+            (*params, limit)
+        )
+    for recipe in recipes:
+        result[recipe.author_id].append(recipe)
+    return result
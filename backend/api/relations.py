@@ -0,0 +1,77 @@
+import time
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+
+from api.db import use_primary
+from recipes.models import Favorite, ShoppingCart, Subscription
+
+# Связь пользователя: модель и поле с id связанного объекта.
+RELATIONS = {
+    'favorites': (Favorite, 'recipe_id'),
+    'shopping_cart': (ShoppingCart, 'recipe_id'),
+    'following': (Subscription, 'author_id'),
+}
+
+EMPTY_RELATIONS = {name: frozenset() for name in RELATIONS}
+
+
+def get_version_key(user_id):
+    return f'relations:{user_id}:version'
+
+
+def get_relations_key(user_id, version):
+    return f'relations:{user_id}:{version}'
+
+
+def invalidate_relations(user_id):
+    """Новая версия делает недействительными кэшированные связи."""
+    cache.set(
+        get_version_key(user_id), time.time(),
+        settings.RELATIONS_CACHE_TIMEOUT
+    )
+
+
+def load_relations(user_id):
+    return {
+        name: array('I', sorted(model.objects.filter(
+            user_id=user_id
+        ).values_list(field, flat=True)))
+        for name, (model, field) in RELATIONS.items()
+    }
+
+
+def get_relations(user):
+    """id избранного, корзины и подписок пользователя.
+
+    Множества хранятся в общем кэше компактными массивами под ключом
+    с версией. Версию меняет любое изменение связей, поэтому набор,
+    прочитанный из базы до изменения, не попадёт в новую версию.
+    """
+    if not user.is_authenticated:
+        return EMPTY_RELATIONS
+    version = cache.get(get_version_key(user.pk))
+    if version is None:
+        version = time.time()
+        cache.add(
+            get_version_key(user.pk), version,
+            settings.RELATIONS_CACHE_TIMEOUT
+        )
+        version = cache.get(get_version_key(user.pk), version)
+    key = get_relations_key(user.pk, version)
+    relations = cache.get(key)
+    if relations is None:
+        with use_primary():
+            relations = load_relations(user.pk)
+        cache.set(key, relations, settings.RELATIONS_CACHE_TIMEOUT)
+    return {name: frozenset(ids) for name, ids in relations.items()}
+
+
+def get_request_relations(request):
+    """Связи пользователя, загруженные один раз на запрос."""
+    relations = getattr(request, 'user_relations', None)
+    if relations is None:
+        relations = get_relations(request.user)
+        request.user_relations = relations
+    return relations
@@ -0,0 +1,81 @@
+"""JSON на orjson, если он установлен, иначе на стандартном json."""
+import codecs
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Даты и числа Decimal кодируются так же, как в JSONRenderer DRF.
+encode_default = JSONEncoder().default
+
+
+def dumps(data):
+    """Компактный JSON в UTF-8, как у JSONRenderer по умолчанию."""
+    if orjson is None:
+        content = json.dumps(
+            data, cls=JSONEncoder, ensure_ascii=False,
+            separators=(',', ':'), allow_nan=False
+        ).encode()
+    else:
+        content = orjson.dumps(
+            data, default=encode_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        )
+    # Разделители строк недопустимы в JavaScript-строках.
+    return content.replace(
+        '\u2028'.encode(), b'\\u2028'
+    ).replace('\u2029'.encode(), b'\\u2029')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson; отступы и ascii - через стандартный json."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if (
+            orjson is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context)
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser на orjson для тел запросов в UTF-8."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+def stream_json_list(serializer, items, batch_size=1000):
+    """Массив JSON по частям: объекты сериализуются по одному
+    и отдаются пачками, весь список в памяти не собирается."""
+    yield b'['
+    batch = []
+    separator = b''
+    for item in items:
+        batch.append(dumps(serializer.to_representation(item)))
+        if len(batch) == batch_size:
+            yield separator + b','.join(batch)
+            separator = b','
+            batch = []
+    if batch:
+        yield separator + b','.join(batch)
+    yield b']'
@@ -0,0 +1,14 @@
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+
+
+def streaming_response(request, content, **kwargs):
+    """Потоковый ответ под WSGI, обычный под ASGI.
+
+    ASGIHandler в Django 3.2 перебирает тело потокового ответа прямо
+    в цикле событий, где запросы к базе запрещены. Поэтому под ASGI
+    тело собирается целиком ещё в потоке представления.
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        return HttpResponse(content, **kwargs)
+    return StreamingHttpResponse(content, **kwargs)
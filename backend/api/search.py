@@ -0,0 +1,242 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Case, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from api.autocomplete import normalize
+from api.cache import get_catalogue_version, invalidate_catalogue
+from api.db import use_primary
+from api.matching import JOURNAL_SEQUENCE_KEY, get_journal_key
+from recipes.constants import RECIPE_SEARCH_MAX_RESULTS
+from recipes.models import Recipe, RecipeIngredient
+
+# Вес поля в ранжировании: название, описание, ингредиенты.
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2}
+
+WORD = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return WORD.findall(normalize(text or ''))
+
+
+def is_postgresql(alias):
+    return connections[alias].vendor == 'postgresql'
+
+
+def update_search_vectors(queryset):
+    """Пересчёт tsvector рецептов; на других СУБД полностью сбрасывает
+    индекс в памяти, поэтому вызывается только для массовых изменений."""
+    if not is_postgresql(queryset.db):
+        invalidate_catalogue('recipe_search')
+        return
+    config = settings.RECIPE_SEARCH_CONFIG
+    ingredients = Subquery(
+        RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+    queryset.update(search_vector=(
+        SearchVector('name', weight='A', config=config)
+        + SearchVector('text', weight='B', config=config)
+        + SearchVector(
+            Coalesce(ingredients, Value('')), weight='C', config=config
+        )
+    ))
+
+
+class RecipeSearchIndex:
+    """Инвертированный индекс рецептов в памяти процесса.
+
+    Используется вместо tsvector, когда база не PostgreSQL. Изменённые
+    рецепты процесс дочитывает из общего журнала изменений рецептов
+    (api.matching) и заменяет их слова в индексе; полностью индекс
+    перестраивается при смене версии в кэше, потере записей журнала
+    или слишком большом числе изменений.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.sequence = 0
+        self.words = []
+        self.postings = {}
+        self.documents = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def score(rows):
+        """Веса слов по рецептам из строк (id, вес, текст)."""
+        documents = defaultdict(dict)
+        for pk, weight, text in rows:
+            scores = documents[pk]
+            for word in tokenize(text):
+                scores[word] = scores.get(word, 0) + WEIGHTS[weight]
+        return documents
+
+    def build(self, rows):
+        """Построение из строк (id, вес, текст)."""
+        documents = self.score(rows)
+        postings = defaultdict(dict)
+        for pk, scores in documents.items():
+            for word, score in scores.items():
+                postings[word][pk] = score
+        self.postings = dict(postings)
+        self.words = sorted(self.postings)
+        self.documents = {
+            pk: tuple(scores) for pk, scores in documents.items()
+        }
+
+    def rebuild(self, version, sequence):
+        self.build(self.get_rows())
+        self.version = version
+        self.sequence = sequence
+
+    def apply(self, recipe_ids):
+        """Замена слов изменённых рецептов.
+
+        Списки рецептов по словам заменяются копиями, а не меняются
+        на месте: их в это время может читать поиск в другом потоке.
+        """
+        documents = self.score(self.get_rows(recipe_ids))
+        postings = self.postings
+        changed = {}
+        for pk in recipe_ids:
+            for word in self.documents.pop(pk, ()):
+                if word not in changed:
+                    changed[word] = dict(postings[word])
+                del changed[word][pk]
+            scores = documents.get(pk)
+            if not scores:
+                continue
+            for word, score in scores.items():
+                if word not in changed:
+                    changed[word] = dict(postings.get(word, {}))
+                changed[word][pk] = score
+            self.documents[pk] = tuple(scores)
+        added = sorted(
+            word for word, pks in changed.items()
+            if pks and word not in postings
+        )
+        removed = {word for word, pks in changed.items() if not pks}
+        for word, pks in changed.items():
+            if pks:
+                postings[word] = pks
+            else:
+                postings.pop(word, None)
+        if added or removed:
+            self.words = list(heapq.merge(
+                (word for word in self.words if word not in removed), added
+            ))
+
+    def refresh(self):
+        version = get_catalogue_version('recipe_search')
+        sequence = cache.get(JOURNAL_SEQUENCE_KEY, 0)
+        if version == self.version and sequence == self.sequence:
+            return
+        with self.lock, use_primary():
+            if version != self.version or sequence < self.sequence:
+                self.rebuild(version, sequence)
+                return
+            if sequence == self.sequence:
+                return
+            changes = cache.get_many([
+                get_journal_key(number)
+                for number in range(self.sequence + 1, sequence + 1)
+            ])
+            if (
+                len(changes) < sequence - self.sequence
+                or len(changes) > settings.MATCHING_MAX_OVERRIDES
+            ):
+                self.rebuild(version, sequence)
+                return
+            self.apply(set(changes.values()))
+            self.sequence = sequence
+
+    @staticmethod
+    def get_rows(recipe_ids=None):
+        recipes = Recipe.objects.all()
+        ingredients = RecipeIngredient.objects.all()
+        if recipe_ids is not None:
+            recipes = recipes.filter(pk__in=recipe_ids)
+            ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+        for pk, name, text in recipes.values_list(
+            'id', 'name', 'text'
+        ).iterator():
+            yield pk, 'A', name
+            yield pk, 'B', text
+        for pk, name in ingredients.values_list(
+            'recipe_id', 'ingredient__name'
+        ).iterator():
+            yield pk, 'C', name
+
+    def match(self, query, limit):
+        """Id рецептов, где есть все слова запроса, по убыванию веса.
+
+        Слово запроса совпадает с любым словом индекса, которое
+        с него начинается.
+        """
+        words, postings = self.words, self.postings
+        result = None
+        for term in set(tokenize(query)):
+            scores = {}
+            position = bisect_left(words, term)
+            while (
+                position < len(words)
+                and words[position].startswith(term)
+            ):
+                # Слово могло пропасть из индекса после чтения words.
+                for pk, score in postings.get(words[position], {}).items():
+                    scores[pk] = max(scores.get(pk, 0), score)
+                position += 1
+            if result is None:
+                result = scores
+            else:
+                result = {
+                    pk: score + scores[pk]
+                    for pk, score in result.items() if pk in scores
+                }
+            if not result:
+                return []
+        if result is None:
+            return []
+        return heapq.nlargest(
+            limit, result, key=lambda pk: (result[pk], pk)
+        )
+
+    def search(self, query, limit):
+        self.refresh()
+        return self.match(query, limit)
+
+
+recipe_index = RecipeSearchIndex()
+
+
+def search_recipes(queryset, value):
+    """Рецепты, подходящие под запрос, по убыванию релевантности."""
+    if is_postgresql(queryset.db):
+        query = SearchQuery(
+            value, search_type='websearch',
+            config=settings.RECIPE_SEARCH_CONFIG
+        )
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-published_date', '-id')
+    ids = recipe_index.search(value, RECIPE_SEARCH_MAX_RESULTS)
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids).order_by(
+        Case(*(When(pk=pk, then=position)
+               for position, pk in enumerate(ids)))
+    )
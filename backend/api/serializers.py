@@ -1,11 +1,18 @@
 from django.core.validators import MinLengthValidator, MinValueValidator
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.validators import UniqueTogetherValidator
 
-from recipes.constants import (MAX_COOKS_TIME, MIN_COOKS_TIME, NAME_MAX_LENGTH,
+from api.fields import HashedBase64ImageField, RenditionsField
+from api.fragments import render_recipes
+from api.images import RenditionsMixin
+from api.relations import get_request_relations
+from recipes.constants import (BULK_RELATIONS_MAX_IDS, MAX_COOKS_TIME,
+                               MIN_COOKS_TIME, NAME_MAX_LENGTH,
                                VALID_CHARACTERS_USERNAME)
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Subscription, Tag, User)
@@ -15,31 +22,36 @@ class UserSerializer(UserSerializer):
     """Сериализатор для user."""
 
     is_subscribed = serializers.SerializerMethodField()
+    avatar_renditions = RenditionsField()
 
     class Meta:
         model = User
         fields = (
-            'email', 'id', 'username', 'avatar',
+            'email', 'id', 'username', 'avatar', 'avatar_renditions',
             'first_name', 'last_name', 'is_subscribed'
         )
         read_only_fields = 'is_subscribed',
 
     def get_is_subscribed(self, obj):
         """Проверка, если ли подписка на пользователя."""
-        user = self.context['request'].user
-        if user.is_anonymous or user == obj:
+        request = self.context['request']
+        if request.user.is_anonymous or request.user == obj:
             return False
-        return Subscription.objects.filter(user=user, author=obj).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return obj.id in get_request_relations(request)['following']
 
 
-class AvatarSerializer(serializers.ModelSerializer):
+class AvatarSerializer(RenditionsMixin, serializers.ModelSerializer):
     """Сериализатор для обновления аватара пользователя."""
 
-    avatar = Base64ImageField(allow_null=True)
+    avatar = HashedBase64ImageField(allow_null=True)
+    avatar_renditions = RenditionsField()
+    rendition_fields = ('avatar',)
 
     class Meta:
         model = User
-        fields = ('avatar',)
+        fields = ('avatar', 'avatar_renditions')
 
 
 class UserRegistrationSerializer(UserCreateSerializer):
@@ -128,12 +140,19 @@ class SubscriptionsSerializer(UserSerializer):
             'is_subscribed',
             'recipes',
             'recipes_count',
-            'avatar'
+            'avatar',
+            'avatar_renditions'
         )
 
     def get_recipes(self, obj):
         """Получение рецептов автора."""
         request = self.context.get('request')
+        if hasattr(obj, 'latest_recipes'):
+            return RecipeShortSerializer(
+                obj.latest_recipes,
+                many=True,
+                context={'request': request}
+            ).data
         recipes = obj.recipes.all()
         recipes_limit = request.query_params.get('recipes_limit')
         if recipes_limit is not None and recipes_limit.isdigit():
@@ -147,7 +166,7 @@ class SubscriptionsSerializer(UserSerializer):
 
     def get_recipes_count(self, obj):
         """Получение рецептов автора."""
-        return obj.recipes.count()
+        return obj.recipes_count
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -163,7 +182,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
-        fields = '__all__'
+        fields = ('id', 'name', 'measurement_unit')
 
 
 class IngredientRecipeSerializer(serializers.ModelSerializer):
@@ -188,9 +207,7 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
 class IngredientAddRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для добавления в рецепт ингредиентов."""
 
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField()
     amount = serializers.IntegerField(
         validators=(MinValueValidator(1),)
     )
@@ -210,8 +227,21 @@ class IngredientAddRecipeSerializer(serializers.ModelSerializer):
         ).data
 
 
+class RecipeListSerializer(serializers.ListSerializer):
+    """Список рецептов из кэша фрагментов, если он включён в контексте."""
+
+    def to_representation(self, data):
+        if not self.context.get('fragments'):
+            return super().to_representation(data)
+        return render_recipes(list(data), type(self.child), self.context)
+
+
 class RecipeReadSerializer(serializers.ModelSerializer):
-    """Сериализатор для просмотра списка рецептов или рецепта."""
+    """Сериализатор для просмотра списка рецептов или рецепта.
+
+    С fragments=True в контексте общая для всех пользователей часть
+    рецепта берётся из кэша фрагментов.
+    """
 
     tags = TagSerializer(many=True)
     author = UserSerializer(read_only=True)
@@ -223,42 +253,50 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField()
+    image_renditions = RenditionsField()
 
     class Meta:
         model = Recipe
-        fields = '__all__'
+        fields = (
+            'id', 'tags', 'author', 'ingredients', 'is_favorited',
+            'is_in_shopping_cart', 'image', 'image_renditions', 'name',
+            'text', 'published_date', 'cooking_time',
+        )
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance):
+        if self.context.get('fragments'):
+            data = render_recipes([instance], type(self), self.context)
+            if data:
+                return data[0]
+        return super().to_representation(instance)
 
     def get_is_favorited(self, obj):
         """Получение поля в избранном ли товар."""
-        user = self.context.get('request').user
-        return (
-            not user.is_anonymous
-            and obj.favorites.filter(user=user).exists()
-        )
+        request = self.context.get('request')
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return obj.id in get_request_relations(request)['favorites']
 
     def get_is_in_shopping_cart(self, obj):
         """Получение поля в корзине ли товар."""
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return (
-            not user.is_anonymous
-            and obj.shopping_cart.filter(user=user).exists()
-        )
+        request = self.context.get('request')
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return obj.id in get_request_relations(request)['shopping_cart']
 
 
-class RecipeCreateSerializer(serializers.ModelSerializer):
+class RecipeCreateSerializer(RenditionsMixin, serializers.ModelSerializer):
     """Сериализатор для создания рецепта."""
 
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all())
-    image = Base64ImageField()
+    tags = serializers.ListField(child=serializers.IntegerField())
+    image = HashedBase64ImageField()
     ingredients = IngredientAddRecipeSerializer(many=True)
     author = UserSerializer(read_only=True)
     cooking_time = serializers.IntegerField(
         min_value=MIN_COOKS_TIME, max_value=MAX_COOKS_TIME
     )
+    rendition_fields = ('image',)
 
     class Meta:
         model = Recipe
@@ -275,27 +313,30 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         ]
 
     def validate(self, data):
-        """Валидация."""
-        ingredients = self.initial_data.get('ingredients')
-        tags = self.initial_data.get('tags')
-        ingredients_list = []
-        for ingredient in ingredients:
-            try:
-                ingredient = Ingredient.objects.get(id=ingredient['id'])
-            except Ingredient.DoesNotExist:
-                raise ValidationError(
-                    'Такого ингредиента нет!'
-                )
-            if ingredient in ingredients_list:
-                raise ValidationError(
-                    'Ингредиенты не должны повторятся!'
-                )
-            ingredients_list.append(ingredient)
-        if len(tags) != len(set(tags)):
+        """Валидация: теги и ингредиенты проверяются одним запросом."""
+        ingredient_ids = [
+            ingredient['id'] for ingredient in data.get('ingredients', ())
+        ]
+        if len(ingredient_ids) != len(set(ingredient_ids)):
+            raise ValidationError(
+                'Ингредиенты не должны повторятся!'
+            )
+        if len(Ingredient.objects.in_bulk(ingredient_ids)) != len(
+            ingredient_ids
+        ):
+            raise ValidationError(
+                'Такого ингредиента нет!'
+            )
+        tag_ids = data.get('tags', ())
+        if len(tag_ids) != len(set(tag_ids)):
             raise ValidationError(
                 'Проверьте теги на дубликаты!'
             )
-        if not data.get('text'):
+        if len(Tag.objects.in_bulk(tag_ids)) != len(tag_ids):
+            raise ValidationError(
+                'Такого тега нет!'
+            )
+        if not data.get('text', getattr(self.instance, 'text', None)):
             raise ValidationError(
                 'Нельзя создать рецепты без текста!'
             )
@@ -306,13 +347,41 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             [
                 RecipeIngredient(
                     recipe=recipe,
-                    ingredient=ingredient.get('id'),
-                    amount=ingredient.get('amount'),
+                    ingredient_id=ingredient['id'],
+                    amount=ingredient['amount'],
                 )
                 for ingredient in ingredients
             ]
         )
 
+    def update_ingredients(self, ingredients, recipe):
+        """Изменение только тех ингредиентов, которые отличаются."""
+        amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        changed = []
+        removed = []
+        for recipe_ingredient in recipe.recipe_ingredients.all():
+            amount = amounts.pop(recipe_ingredient.ingredient_id, None)
+            if amount is None:
+                removed.append(recipe_ingredient.pk)
+            elif amount != recipe_ingredient.amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        if removed:
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        self.add_ingredients(
+            [
+                {'id': ingredient_id, 'amount': amount}
+                for ingredient_id, amount in amounts.items()
+            ],
+            recipe
+        )
+
+    @transaction.atomic
     def create(self, validated_data):
         user = self.context.get('request').user
         ingredients = validated_data.pop('ingredients')
@@ -322,21 +391,28 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         self.add_ingredients(ingredients, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
         recipe = super().update(instance, validated_data)
         if tags:
-            recipe.tags.clear()
             recipe.tags.set(tags)
         if ingredients:
-            recipe.ingredients.clear()
-            self.add_ingredients(ingredients, recipe)
+            self.update_ingredients(ingredients, recipe)
         return recipe
 
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
         return RecipeReadSerializer(instance,
                                     context=context).data
 
@@ -344,16 +420,34 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 class RecipeShortSerializer(serializers.ModelSerializer):
     """Сериализатор для рецептов в подписках."""
 
+    image_renditions = RenditionsField()
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'image_renditions',
             'cooking_time'
         )
 
 
+class RecipeMatchSerializer(RecipeShortSerializer):
+    """Сериализатор для подбора рецептов по ингредиентам."""
+
+    matched = serializers.IntegerField()
+    total = serializers.IntegerField()
+    missing = IngredientSerializer(many=True)
+
+    class Meta(RecipeShortSerializer.Meta):
+        fields = RecipeShortSerializer.Meta.fields + (
+            'matched',
+            'total',
+            'missing'
+        )
+
+
 class FavoriteSerializer(serializers.ModelSerializer):
     """Сериализатор для добавления рецепта в избранные."""
 
@@ -369,6 +463,20 @@ class FavoriteSerializer(serializers.ModelSerializer):
         ]
 
 
+class BulkIdsSerializer(serializers.Serializer):
+    """Список id для массового добавления или удаления."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_RELATIONS_MAX_IDS,
+    )
+
+    def validate_ids(self, value):
+        """Повторы убираются, порядок сохраняется."""
+        return list(dict.fromkeys(value))
+
+
 class ShoppingCartSerializer(serializers.ModelSerializer):
     """Сериализатор для списка покупок."""
 
@@ -0,0 +1,78 @@
+import csv
+import json
+
+from django.db.models import F, Sum
+
+from recipes.models import RecipeIngredient
+
+SHOPPING_LIST_FORMATS = {
+    'txt': 'text/plain; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'json': 'application/json',
+}
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def get_shopping_list(user):
+    """Суммарное количество ингредиентов из корзины одним запросом."""
+    return RecipeIngredient.objects.filter(
+        recipe__shopping_cart__user=user
+    ).values(
+        name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit'),
+    ).annotate(
+        total=Sum('amount')
+    ).order_by('name')
+
+
+def render_txt(ingredients):
+    yield 'Ваши покупки:\n'
+    for item in ingredients:
+        yield (
+            f'{item["name"]}: '
+            f'{item["total"]} '
+            f'{item["measurement_unit"]}.\n'
+        )
+
+
+def render_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'amount', 'measurement_unit'))
+    for item in ingredients:
+        yield writer.writerow(
+            (item['name'], item['total'], item['measurement_unit'])
+        )
+
+
+def render_json(ingredients):
+    yield '['
+    separator = ''
+    for item in ingredients:
+        yield separator + json.dumps(
+            {
+                'name': item['name'],
+                'amount': item['total'],
+                'measurement_unit': item['measurement_unit'],
+            },
+            ensure_ascii=False
+        )
+        separator = ','
+    yield ']'
+
+
+RENDERERS = {
+    'txt': render_txt,
+    'csv': render_csv,
+    'json': render_json,
+}
+
+
+def stream_shopping_list(user, file_format):
+    """Потоковая выгрузка списка покупок в выбранном формате."""
+    return RENDERERS[file_format](get_shopping_list(user).iterator())
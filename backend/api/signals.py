@@ -0,0 +1,180 @@
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_user_tokens
+from api.cache import invalidate_catalogue
+from api.db import check_connections, mark_connections_used
+from api.matching import record_recipe_change
+from api.relations import invalidate_relations
+from api.search import is_postgresql, update_search_vectors
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Subscription, Tag, User)
+from recipes.signals import (ingredients_imported, recipes_imported,
+                             renditions_updated)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(**kwargs):
+    """Сброс кэша тегов."""
+    invalidate_catalogue('tags')
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver(ingredients_imported)
+def invalidate_ingredients(**kwargs):
+    """Сброс кэша ингредиентов."""
+    invalidate_catalogue('ingredients')
+
+
+# Поля, которые сохраняются без изменения данных пользователя в ответах.
+USER_SERVICE_FIELDS = frozenset(('last_login',))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(instance, **kwargs):
+    """Выход пользователя или удаление токена."""
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_user_tokens(user_id))
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user(instance, created, update_fields, **kwargs):
+    """Смена пароля, блокировка и другие изменения пользователя.
+
+    Вход обновляет только last_login и кэш токенов не сбрасывает.
+    """
+    if created or (
+        update_fields is not None
+        and not set(update_fields) - USER_SERVICE_FIELDS
+    ):
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_user_tokens(pk))
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search(instance, **kwargs):
+    """Обновление tsvector после сохранения ингредиентов.
+
+    Индекс в памяти без PostgreSQL дочитывает рецепт из журнала
+    изменений (update_recipe_matching).
+    """
+    if not is_postgresql(instance._state.db):
+        return
+    transaction.on_commit(lambda: update_search_vectors(
+        Recipe.objects.filter(pk=instance.pk)
+    ))
+
+
+@receiver(post_delete, sender=Ingredient)
+@receiver(recipes_imported)
+def invalidate_recipe_search(**kwargs):
+    """Полная перестройка индекса в памяти без PostgreSQL."""
+    invalidate_catalogue('recipe_search')
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_search(instance, created, **kwargs):
+    """Переименованный ингредиент меняет индекс его рецептов."""
+    if created:
+        return
+    transaction.on_commit(lambda: update_search_vectors(
+        Recipe.objects.filter(ingredients=instance)
+    ))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def update_recipe_matching(instance, **kwargs):
+    """Рецепт попадает в журнал индексов подбора по ингредиентам
+    и поиска в памяти."""
+    pk = instance.pk
+    transaction.on_commit(lambda: record_recipe_change(pk))
+
+
+@receiver(post_delete, sender=Ingredient)
+@receiver(recipes_imported)
+def invalidate_recipe_matching(**kwargs):
+    """Полная перестройка индекса подбора по ингредиентам."""
+    invalidate_catalogue('recipe_matching')
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Subscription)
+def update_user_relations(instance, **kwargs):
+    """Новая версия кэша связей пользователя после фиксации транзакции."""
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_relations(user_id))
+
+
+def invalidate_recipe(pk):
+    invalidate_catalogue(f'recipe:{pk}')
+    invalidate_catalogue('recipe_feed')
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe_responses(instance, **kwargs):
+    """Сброс кэша ответов рецепта и ленты после фиксации транзакции."""
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_recipe(pk))
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def invalidate_recipe_ingredient_responses(instance, **kwargs):
+    """Состав рецепта изменился."""
+    recipe_id = instance.recipe_id
+    transaction.on_commit(lambda: invalidate_recipe(recipe_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags_responses(instance, action, reverse, pk_set,
+                                     **kwargs):
+    """Теги рецепта изменились без сохранения самого рецепта."""
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        recipe_ids = pk_set or ()
+    else:
+        recipe_ids = (instance.pk,)
+    for pk in recipe_ids:
+        transaction.on_commit(lambda pk=pk: invalidate_recipe(pk))
+
+
+@receiver(recipes_imported)
+def invalidate_recipe_feed(**kwargs):
+    """Рецепты созданы без post_save."""
+    invalidate_catalogue('recipe_feed')
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_responses(instance, created, **kwargs):
+    """Имя или аватар автора есть в ответах с его рецептами."""
+    if created:
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_catalogue(f'user:{pk}'))
+
+
+@receiver(renditions_updated, sender=Recipe)
+def invalidate_recipe_renditions(pk, **kwargs):
+    """Фрагменты и ответы с рецептом получают копии изображения."""
+    invalidate_recipe(pk)
+
+
+@receiver(renditions_updated, sender=User)
+def invalidate_avatar_renditions(pk, **kwargs):
+    """Копии аватара есть в ответах с рецептами автора."""
+    invalidate_catalogue(f'user:{pk}')
+
+
+@receiver(renditions_updated, sender=User)
+def invalidate_avatar_tokens(pk, **kwargs):
+    """Пользователь в кэше токенов тоже получает копии аватара."""
+    invalidate_user_tokens(pk)
+
+
+request_started.connect(check_connections)
+request_finished.connect(mark_connections_used)
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from api.cache import get_catalogue_version
+from api.db import use_primary
+from recipes.constants import (INGREDIENTS_SNAPSHOT_OVERLAP,
+                               INGREDIENTS_TOMBSTONE_DAYS)
+from recipes.models import DeletedIngredient, Ingredient
+
+
+def to_token(moment):
+    """Версия снимка: время в микросекундах."""
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def from_token(token):
+    """Время версии или None, если число вне допустимых дат."""
+    try:
+        return datetime.fromtimestamp(
+            int(token) / 1_000_000, tz=dt_timezone.utc
+        )
+    except (OverflowError, ValueError, OSError):
+        return None
+
+
+def build_snapshot(queryset, moment, full):
+    """Ингредиенты тремя массивами: id, названия и единицы измерения."""
+    ids, names, units = [], [], []
+    for pk, name, unit in queryset.order_by('id').values_list(
+        'id', 'name', 'measurement_unit'
+    ).iterator():
+        ids.append(pk)
+        names.append(name)
+        units.append(unit)
+    return {
+        'version': to_token(moment),
+        'full': full,
+        'ids': ids,
+        'names': names,
+        'units': units,
+        'deleted': [],
+    }
+
+
+def get_full_snapshot():
+    """Весь справочник; хранится в кэше до изменения ингредиентов."""
+    version = get_catalogue_version('ingredients')
+    key = f'catalogue:ingredients:{version}:snapshot'
+    snapshot = cache.get(key)
+    if snapshot is None:
+        with use_primary():
+            snapshot = build_snapshot(
+                Ingredient.objects.all(), timezone.now(), full=True
+            )
+        cache.set(key, snapshot, settings.CATALOGUE_CACHE_TIMEOUT)
+    return snapshot
+
+
+def get_snapshot(token=None):
+    """Снимок справочника или его изменения после версии token.
+
+    Изменения отдаются с запасом по времени, чтобы не потерять
+    транзакции, зафиксированные позже начала предыдущего снимка;
+    клиент применяет их повторно без вреда. Для слишком старой
+    версии, удаления по которой уже не хранятся, и для недопустимой
+    версии отдаётся весь снимок.
+    """
+    moment = timezone.now()
+    if token is None:
+        return get_full_snapshot()
+    since = from_token(token)
+    if (
+        since is None
+        or since > moment
+        or since < moment - timedelta(days=INGREDIENTS_TOMBSTONE_DAYS)
+    ):
+        return get_full_snapshot()
+    since -= timedelta(seconds=INGREDIENTS_SNAPSHOT_OVERLAP)
+    snapshot = build_snapshot(
+        Ingredient.objects.filter(updated_at__gt=since), moment, full=False
+    )
+    snapshot['deleted'] = sorted(set(DeletedIngredient.objects.filter(
+        deleted_at__gt=since
+    ).values_list('ingredient_id', flat=True)))
+    return snapshot
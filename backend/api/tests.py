@@ -0,0 +1,469 @@
+import base64
+import io
+import json
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import update_last_login
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+from django.test import override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from api.authentication import get_generation, local_tokens
+from api.cache import local_cache
+from api.search import RecipeSearchIndex, recipe_index
+from api.views import RecipeViewSet
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Subscription, Tag, User)
+from recipes.storage import release_file
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class RecipeListQueriesTest(APITestCase):
+    """Число запросов к базе в списке рецептов не зависит от limit."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tags = [
+            Tag.objects.create(name=f'Тег {index}', slug=f'tag{index}')
+            for index in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {index}', measurement_unit='г'
+            )
+            for index in range(5)
+        ]
+        authors = [
+            User.objects.create_user(
+                email=f'author{index}@example.com',
+                username=f'author{index}', password='password123',
+                first_name='Автор', last_name=str(index)
+            )
+            for index in range(5)
+        ]
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            password='password123', first_name='Читатель',
+            last_name='Читатель'
+        )
+        for index in range(30):
+            recipe = Recipe.objects.create(
+                author=authors[index % len(authors)],
+                name=f'Рецепт {index}',
+                image='recipes/images/recipe.png',
+                text='Описание',
+                cooking_time=10,
+            )
+            recipe.tags.set(tags[:index % len(tags) + 1])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=index + 1
+                )
+                for ingredient in ingredients[:index % len(ingredients) + 1]
+            )
+            if index % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            if index % 3:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Subscription.objects.create(user=cls.user, author=authors[0])
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.clear_caches()
+
+    @staticmethod
+    def clear_caches():
+        cache.clear()
+        local_cache.entries.clear()
+        local_tokens.entries.clear()
+
+    def assert_queries_constant(self, expected):
+        for limit in (2, 10, 30):
+            with self.subTest(limit=limit):
+                self.clear_caches()
+                with self.assertNumQueries(expected):
+                    response = self.client.get(
+                        '/api/recipes/', {'limit': limit}
+                    )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_anonymous_list(self):
+        self.assert_queries_constant(5)
+
+    def test_authenticated_list(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assert_queries_constant(9)
+
+    @override_settings(RESPONSE_CACHE_LOCK_WAIT=5)
+    def test_cold_miss_waits_for_rebuild(self):
+        with mock.patch.object(
+            RecipeViewSet, 'get_cache_key', return_value='test:recipes'
+        ):
+            expected = self.client.get('/api/recipes/').data
+            entry = cache.get('test:recipes')
+            self.clear_caches()
+            cache.add('test:recipes:lock', True)
+            threading.Timer(
+                0.2, cache.set, ('test:recipes', entry)
+            ).start()
+            with self.assertNumQueries(0):
+                response = self.client.get('/api/recipes/')
+        self.assertEqual(response.data, expected)
+        self.assertTrue(cache.get('test:recipes:lock'))
+
+    @override_settings(RESPONSE_CACHE_LOCK_WAIT=0)
+    def test_cold_miss_computes_after_wait(self):
+        with mock.patch.object(
+            RecipeViewSet, 'get_cache_key', return_value='test:recipes'
+        ):
+            cache.add('test:recipes:lock', True)
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(cache.get('test:recipes:lock'))
+
+    def test_authenticated_flags(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        response = self.client.get('/api/recipes/', {'limit': 30})
+        for recipe in response.data['results']:
+            index = int(recipe['name'].split()[1])
+            self.assertEqual(recipe['is_favorited'], bool(index % 2))
+            self.assertEqual(recipe['is_in_shopping_cart'], bool(index % 3))
+            self.assertEqual(
+                recipe['author']['is_subscribed'],
+                recipe['author']['username'] == 'author0'
+            )
+
+
+def asgi_get(path, query_string='', headers=()):
+    """GET через настоящее ASGI-приложение, как под uvicorn.
+
+    Тестовый AsyncClient не перебирает тело потокового ответа
+    в цикле событий, поэтому не ловит запросы к базе в нём.
+    """
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'query_string': query_string.encode(),
+        'headers': [(b'host', b'testserver'), *headers],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 12345),
+    }
+    # Как тестовый клиент: не закрывать соединение внутри транзакции теста.
+    request_started.disconnect(close_old_connections)
+    request_finished.disconnect(close_old_connections)
+    try:
+        async_to_sync(get_asgi_application())(scope, receive, send)
+    finally:
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+    status = messages[0]['status']
+    body = b''.join(
+        message.get('body', b'') for message in messages
+        if message['type'] == 'http.response.body'
+    )
+    return status, body
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ShoppingListTest(APITestCase):
+    """Выгрузка списка покупок под WSGI и ASGI."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='buyer@example.com', username='buyer',
+            password='password123', first_name='Покупатель',
+            last_name='Покупатель'
+        )
+        ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+        for index in range(2):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=f'Пирог {index}',
+                image='recipes/images/recipe.png', text='Описание',
+                cooking_time=10,
+            )
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=100
+            )
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_wsgi(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'Мука: 200 г.', b''.join(response.streaming_content).decode()
+        )
+
+    def test_asgi(self):
+        for file_format, expected in (
+            ('txt', 'Мука: 200 г.'), ('csv', 'Мука,200,г'),
+            ('json', '"amount": 200'),
+        ):
+            with self.subTest(file_format=file_format):
+                status, body = asgi_get(
+                    '/api/recipes/download_shopping_cart/',
+                    f'file_format={file_format}',
+                    [(b'authorization', f'Token {self.token.key}'.encode())]
+                )
+                self.assertEqual(status, 200)
+                self.assertIn(expected, body.decode())
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class IngredientStreamTest(APITestCase):
+    """Список ингредиентов с stream=true под WSGI и ASGI."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {index}', measurement_unit='г')
+            for index in range(2500)
+        )
+
+    def setUp(self):
+        cache.clear()
+        local_cache.entries.clear()
+
+    def get_expected(self):
+        return json.loads(self.client.get('/api/ingredients/').content)
+
+    def test_wsgi(self):
+        response = self.client.get('/api/ingredients/', {'stream': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            json.loads(b''.join(response.streaming_content)),
+            self.get_expected()
+        )
+
+    def test_asgi(self):
+        status, body = asgi_get('/api/ingredients/', 'stream=true')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), self.get_expected())
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], SHARED_CACHE=True)
+class CachedTokenAuthenticationTest(APITestCase):
+    """Кэш пользователя по токену и его сброс."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='member@example.com', username='member',
+            password='password123', first_name='Участник',
+            last_name='Участник'
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        local_tokens.entries.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_me(self):
+        return self.client.get('/api/users/me/')
+
+    def test_cached(self):
+        self.get_me()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_me().status_code, 200)
+
+    def test_last_login_keeps_cache(self):
+        self.get_me()
+        generation = get_generation(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            update_last_login(None, self.user)
+        self.assertEqual(get_generation(self.user.pk), generation)
+
+    def test_changes_reset_cache(self):
+        self.get_me()
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(first_name='Новое')
+            self.user.refresh_from_db()
+            self.user.save()
+        self.assertEqual(self.get_me().data['first_name'], 'Новое')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save(update_fields=['is_active'])
+        self.assertEqual(self.get_me().status_code, 401)
+
+    def test_logout(self):
+        self.get_me()
+        with self.captureOnCommitCallbacks(execute=True):
+            Token.objects.filter(key=self.token.key).delete()
+        self.assertEqual(self.get_me().status_code, 401)
+
+    @override_settings(SHARED_CACHE=False)
+    def test_local_memory_cache_is_not_used(self):
+        self.get_me()
+        with self.captureOnCommitCallbacks(execute=True):
+            Token.objects.filter(key=self.token.key).delete()
+        self.assertFalse(local_tokens.entries)
+        self.assertEqual(self.get_me().status_code, 401)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], DEBUG=False)
+class MetricsAccessTest(APITestCase):
+    """Метрики и Server-Timing только с токеном метрик."""
+
+    def setUp(self):
+        cache.clear()
+        local_cache.entries.clear()
+
+    @override_settings(METRICS_TOKEN='')
+    def test_no_token_configured(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+        self.assertNotIn('Server-Timing', self.client.get('/api/tags/'))
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+        self.assertNotIn('Server-Timing', self.client.get('/api/tags/'))
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 200)
+        self.assertIn('Server-Timing', self.client.get('/api/tags/'))
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'], MEDIA_ROOT=MEDIA_ROOT,
+    IMAGE_ORIGINAL_MAX_SIZE=100
+)
+class ImageUploadTest(APITestCase):
+    """Загруженное изображение сохраняется без EXIF и уменьшенным."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='photo@example.com', username='photo',
+            password='password123', first_name='Фото', last_name='Фото'
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def test_avatar(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x8825] = {1: 'N'}
+        buffer = io.BytesIO()
+        Image.new('RGB', (400, 200)).save(buffer, 'JPEG', exif=exif)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        response = self.client.put('/api/users/me/avatar/', {
+            'avatar': 'data:image/jpeg;base64,'
+            + base64.b64encode(buffer.getvalue()).decode()
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        with Image.open(self.user.avatar.path) as image:
+            self.assertEqual(image.size, (50, 100))
+            self.assertFalse(image.getexif())
+
+    def test_reused_file_restored_after_release(self):
+        name = default_storage.save('users/a.png', ContentFile(b'avatar'))
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(
+                default_storage.save('users/b.png', ContentFile(b'avatar')),
+                name
+            )
+        # Другая запись освободила файл до коммита этой.
+        default_storage.delete(name)
+        for callback in callbacks:
+            callback()
+        self.assertTrue(default_storage.exists(name))
+
+    def test_release_unreferenced_file(self):
+        name = default_storage.save('users/c.png', ContentFile(b'old'))
+        with self.captureOnCommitCallbacks(execute=True):
+            release_file(name)
+        self.assertFalse(default_storage.exists(name))
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class RecipeSearchIndexTest(APITestCase):
+    """Индекс поиска в памяти обновляется по журналу без перестройки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='cook@example.com', username='cook',
+            password='password123', first_name='Повар', last_name='Повар'
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='Свёкла', measurement_unit='г'
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.author, name=name, image='recipes/images/a.png',
+                text='Описание', cooking_time=10,
+            )
+            for name in ('Борщ', 'Салат', 'Пирог')
+        ]
+        RecipeIngredient.objects.create(
+            recipe=cls.recipes[1], ingredient=cls.ingredient, amount=1
+        )
+
+    def setUp(self):
+        cache.clear()
+        local_cache.entries.clear()
+        recipe_index.version = None
+
+    def search(self, query):
+        return [
+            recipe['name'] for recipe in self.client.get(
+                '/api/recipes/', {'search': query}
+            ).data['results']
+        ]
+
+    def test_incremental(self):
+        self.assertEqual(self.search('борщ'), ['Борщ'])
+        with mock.patch.object(
+            recipe_index, 'rebuild', side_effect=AssertionError
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.recipes[2].name = 'Борщ зелёный'
+                self.recipes[2].save()
+                self.recipes[0].delete()
+            self.assertEqual(self.search('борщ'), ['Борщ зелёный'])
+            self.assertEqual(self.search('свёкла'), ['Салат'])
+            self.assertEqual(self.search('пирог'), [])
+        rebuilt = RecipeSearchIndex()
+        rebuilt.build(rebuilt.get_rows())
+        self.assertEqual(recipe_index.postings, rebuilt.postings)
+        self.assertEqual(recipe_index.words, rebuilt.words)
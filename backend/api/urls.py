@@ -1,8 +1,9 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from api import async_views
 from api.views import (IngredientViewSet, RecipeViewSet, TagViewSet,
-                       UserProfileViewSet)
+                       UserProfileViewSet, metrics)
 
 app_name = 'api'
 
@@ -13,7 +14,33 @@ router_v1.register('ingredients', IngredientViewSet, basename='ingredients')
 router_v1.register('tags', TagViewSet, basename='tags')
 router_v1.register('recipes', RecipeViewSet, basename='recipes')
 
+# Асинхронные версии эндпоинтов чтения для запуска под ASGI.
+async_urlpatterns = [
+    path('recipes/', async_views.recipe_list, name='async-recipes-list'),
+    path(
+        'recipes/<int:pk>/', async_views.recipe_detail,
+        name='async-recipes-detail'
+    ),
+    path('tags/', async_views.tag_list, name='async-tags-list'),
+    path('tags/<int:pk>/', async_views.tag_detail, name='async-tags-detail'),
+    path(
+        'ingredients/', async_views.ingredient_list,
+        name='async-ingredients-list'
+    ),
+    path(
+        'ingredients/<int:pk>/', async_views.ingredient_detail,
+        name='async-ingredients-detail'
+    ),
+    path('users/me/', async_views.user_me, name='async-users-me'),
+    path(
+        'users/<int:pk>/', async_views.user_detail,
+        name='async-users-detail'
+    ),
+]
+
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
+    path('metrics/', metrics, name='metrics'),
+    path('async/', include(async_urlpatterns)),
     path('', include(router_v1.urls)),
 ]
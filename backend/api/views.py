@@ -1,3 +1,6 @@
+from django.db import transaction
+from django.db.models import BooleanField, Prefetch, Value
+from django.http import HttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import permissions, status, viewsets
@@ -6,43 +9,103 @@ from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from api.bulk import add_relations, remove_relations
+from api.cache import AnonymousCacheMixin, CatalogueCacheMixin
+from api.db import ReplicaReadMixin
 from api.filters import NameFilterSet, RecipeFilter
-from api.pagination import LimitPagination
+from api.matching import recipe_ingredient_index
+from api.metrics import MetricsMixin, has_metrics_access, render_metrics
+from api.pagination import (CursorPaginationMixin, LimitPagination,
+                            OptionalPagePagination, RecipeCursorPagination,
+                            SubscriptionCursorPagination)
 from api.permissions import IsAdminAuthorOrReadOnly
-from api.serializers import (AvatarSerializer, FavoriteSerializer,
-                             IngredientSerializer, RecipeCreateSerializer,
+from api.querysets import get_latest_recipes
+from api.renderers import stream_json_list
+from api.responses import streaming_response
+from api.serializers import (AvatarSerializer, BulkIdsSerializer,
+                             FavoriteSerializer, IngredientSerializer,
+                             RecipeCreateSerializer, RecipeMatchSerializer,
                              RecipeReadSerializer, ShoppingCartSerializer,
                              SubscribeSerializer, SubscriptionsSerializer,
                              TagSerializer, UserSerializer)
-from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart, Tag,
-                            User)
+from api.shopping_list import SHOPPING_LIST_FORMATS, stream_shopping_list
+from api.snapshot import get_snapshot
+from recipes.constants import (RECIPE_MATCHING_LIMIT,
+                               RECIPE_MATCHING_MAX_INGREDIENTS,
+                               RECIPE_MATCHING_MAX_LIMIT)
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Subscription, Tag, User)
+from recipes.storage import release_file
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(MetricsMixin, ReplicaReadMixin, CatalogueCacheMixin,
+                 viewsets.ReadOnlyModelViewSet):
     """ViewSet для получения тегов."""
 
+    catalogue = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = (AllowAny,)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(MetricsMixin, ReplicaReadMixin, CatalogueCacheMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """ViewSet для получения списка ингредиентов и отдельного ингредиента."""
 
+    catalogue = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    pagination_class = None
+    pagination_class = OptionalPagePagination
     permission_classes = (AllowAny,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = NameFilterSet
 
+    def list(self, request, *args, **kwargs):
+        """С stream=true список отдаётся по частям, минуя кэш;
+        под ASGI - одним ответом, см. streaming_response."""
+        if request.query_params.get('stream', '').lower() not in (
+            '1', 'true'
+        ):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        # База выбирается сейчас: ответ читается уже после dispatch.
+        queryset = queryset.using(queryset.db)
+        return streaming_response(
+            request,
+            stream_json_list(self.get_serializer(), queryset.iterator()),
+            content_type='application/json'
+        )
 
-class RecipeViewSet(viewsets.ModelViewSet):
+    @action(
+        methods=['GET'],
+        detail=False,
+        url_path='snapshot',
+    )
+    def snapshot(self, request):
+        """Компактный снимок справочника или изменения с версии since."""
+        token = request.query_params.get('since')
+        if token is not None and not token.isdigit():
+            return Response(
+                {'since': 'Передайте version из предыдущего снимка'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(get_snapshot(token))
+
+
+class RecipeViewSet(MetricsMixin, ReplicaReadMixin, AnonymousCacheMixin,
+                    CursorPaginationMixin, viewsets.ModelViewSet):
     """ViewSet для получения рецепт."""
 
+    cache_prefix = 'recipes'
+    cache_query_params = (
+        'tags', 'author', 'search', 'page', 'limit', 'cursor', 'pagination',
+        'count'
+    )
+    cache_catalogues = ('tags', 'ingredients')
     queryset = Recipe.objects.all()
     pagination_class = LimitPagination
+    cursor_pagination_classes = {'list': RecipeCursorPagination}
     permission_classes = (
         permissions.IsAuthenticatedOrReadOnly,
         IsAdminAuthorOrReadOnly
@@ -50,9 +113,39 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        """Рецепты для list и retrieve без связей.
+
+        Ответ собирается из кэша фрагментов, поэтому нужны только
+        поля для пагинации; остальное читается для промахов кэша.
+        """
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        return queryset.only('id', 'author', 'published_date')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fragments'] = self.action in ('list', 'retrieve')
+        return context
+
+    def get_cache_catalogues(self, data):
+        if self.action == 'retrieve':
+            recipes = [data]
+            catalogues = [f'recipe:{data["id"]}']
+        else:
+            recipes = data['results']
+            catalogues = ['recipe_feed']
+        return catalogues + list(self.cache_catalogues) + [
+            f'user:{author_id}'
+            for author_id in {recipe['author']['id'] for recipe in recipes}
+        ]
+
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return RecipeReadSerializer
+        if self.action == 'what_can_i_cook':
+            return RecipeMatchSerializer
         return RecipeCreateSerializer
 
     @action(
@@ -60,6 +153,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         detail=True,
         permission_classes=(IsAuthenticated,),
     )
+    @transaction.atomic
     def favorite(self, request, pk):
         """В Избранном."""
         recipe = get_object_or_404(Recipe, id=pk)
@@ -89,6 +183,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         detail=True,
         url_path='shopping_cart',
     )
+    @transaction.atomic
     def shopping_cart(self, request, pk):
         recipe = get_object_or_404(Recipe, id=pk)
         user = self.request.user
@@ -113,6 +208,100 @@ class RecipeViewSet(viewsets.ModelViewSet):
             cart.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def bulk_recipes(self, request, model):
+        """Массовое добавление или удаление рецептов по списку id."""
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        if request.method == 'DELETE':
+            results = remove_relations(request.user, model, 'recipe', ids)
+        else:
+            targets = set(
+                Recipe.objects.filter(pk__in=ids).values_list('pk', flat=True)
+            )
+            results = add_relations(
+                request.user, model, 'recipe', ids, targets
+            )
+        return Response({'results': results})
+
+    @action(
+        methods=['POST', 'DELETE'],
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        url_path='favorite',
+    )
+    @transaction.atomic
+    def favorite_bulk(self, request):
+        """Несколько рецептов в Избранном."""
+        return self.bulk_recipes(request, Favorite)
+
+    @action(
+        methods=['POST', 'DELETE'],
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart',
+    )
+    @transaction.atomic
+    def shopping_cart_bulk(self, request):
+        """Несколько рецептов в списке покупок."""
+        return self.bulk_recipes(request, ShoppingCart)
+
+    @action(
+        methods=['GET'],
+        detail=False,
+        permission_classes=(AllowAny,),
+        url_path='what_can_i_cook',
+    )
+    def what_can_i_cook(self, request):
+        """Рецепты, для которых есть больше всего ингредиентов."""
+        values = [
+            value.strip()
+            for param in request.query_params.getlist('ingredients')
+            for value in param.split(',') if value.strip()
+        ]
+        if not values or not all(value.isdigit() for value in values):
+            return Response(
+                {'ingredients': 'Укажите id ингредиентов через запятую'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        ingredient_ids = set(map(int, values))
+        if len(ingredient_ids) > RECIPE_MATCHING_MAX_INGREDIENTS:
+            return Response(
+                {'ingredients': (
+                    'Не больше '
+                    f'{RECIPE_MATCHING_MAX_INGREDIENTS} ингредиентов'
+                )},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = request.query_params.get('limit', '')
+        if not limit.isdigit() or int(limit) < 1:
+            limit = RECIPE_MATCHING_LIMIT
+        limit = min(int(limit), RECIPE_MATCHING_MAX_LIMIT)
+        matches, count = recipe_ingredient_index.search(ingredient_ids, limit)
+        recipes = Recipe.objects.defer('search_vector').prefetch_related(
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            )
+        ).in_bulk([recipe_id for recipe_id, _, _ in matches])
+        results = []
+        for recipe_id, _, _ in matches:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            ingredients = [
+                item.ingredient for item in recipe.recipe_ingredients.all()
+            ]
+            recipe.missing = [
+                ingredient for ingredient in ingredients
+                if ingredient.id not in ingredient_ids
+            ]
+            recipe.total = len(ingredients)
+            recipe.matched = recipe.total - len(recipe.missing)
+            results.append(recipe)
+        serializer = self.get_serializer(results, many=True)
+        return Response({'count': count, 'results': serializer.data})
+
     @action(
         methods=['GET'],
         detail=False,
@@ -123,36 +312,29 @@ class RecipeViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if not user.shopping_cart.exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        cart_recipes = ShoppingCart.objects.filter(user=user)
-        ingredients = {}
-        for recipe in cart_recipes:
-            for ingredient in recipe.recipe.recipe_ingredients.all():
-                name = ingredient.ingredient.name
-                amount = ingredient.amount
-                measurement_unit = ingredient.ingredient.measurement_unit
-                if name in ingredients:
-                    ingredients[name][0] += amount
-                else:
-                    ingredients[name] = [amount, measurement_unit]
-        carts_list = 'Ваши покупки: '
-        for name in ingredients.keys():
-            carts_list += (
-                f'{name}: '
-                f'{ingredients[name][0]} '
-                f'{ingredients[name][1]}.'
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                {'file_format': (
+                    f'Доступные форматы: {", ".join(SHOPPING_LIST_FORMATS)}'
+                )},
+                status=status.HTTP_400_BAD_REQUEST
             )
-
-        response = Response(carts_list, content_type='text/plain')
+        response = streaming_response(
+            request, stream_shopping_list(user, file_format),
+            content_type=SHOPPING_LIST_FORMATS[file_format]
+        )
         response['Content-Disposition'] = (
-            f'attachment; filename="{user}_shopping_list.txt"'
+            f'attachment; filename="{user}_shopping_list.{file_format}"'
         )
         return response
 
 
-class UserProfileViewSet(UserViewSet):
+class UserProfileViewSet(MetricsMixin, CursorPaginationMixin, UserViewSet):
     """Получение информации о пользователе."""
 
     serializer_class = UserSerializer
+    cursor_pagination_classes = {'subscriptions': SubscriptionCursorPagination}
     permission_classes = (IsAuthenticated,)
 
     @action(
@@ -170,8 +352,11 @@ class UserProfileViewSet(UserViewSet):
             serializer.save()
             return Response(data=serializer.data, status=status.HTTP_200_OK)
         instance = self.get_instance()
+        previous = instance.avatar.name
         instance.avatar = None
+        instance.avatar_renditions = {}
         instance.save()
+        release_file(previous)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -184,11 +369,18 @@ class UserProfileViewSet(UserViewSet):
     def subscriptions(self, request):
         """Список подписок."""
         user = self.request.user
-        queryset = User.objects.filter(follower__user=user)
+        queryset = User.objects.filter(follower__user=user).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        )
         pages = self.paginate_queryset(queryset)
-        serializer = SubscriptionsSerializer(
-            pages, many=True, context={"request": request}
+        recipes_limit = request.query_params.get('recipes_limit', '')
+        recipes = get_latest_recipes(
+            [author.id for author in pages],
+            int(recipes_limit) if recipes_limit.isdigit() else None
         )
+        for author in pages:
+            author.latest_recipes = recipes[author.id]
+        serializer = self.get_serializer(pages, many=True)
         return self.get_paginated_response(serializer.data)
 
     @action(
@@ -198,6 +390,7 @@ class UserProfileViewSet(UserViewSet):
         detail=True,
         url_path='subscribe',
     )
+    @transaction.atomic
     def subscribe(self, request, id):
         author = get_object_or_404(User, id=id)
         follower = request.user.following.filter(author=author)
@@ -221,3 +414,37 @@ class UserProfileViewSet(UserViewSet):
             return Response(status=status.HTTP_400_BAD_REQUEST)
         follower.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(
+        methods=['POST', 'DELETE'],
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        url_path='subscribe',
+    )
+    @transaction.atomic
+    def subscribe_bulk(self, request):
+        """Подписка на нескольких авторов или отписка от них."""
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        user = request.user
+        if request.method == 'DELETE':
+            results = remove_relations(user, Subscription, 'author', ids)
+        else:
+            targets = set(User.objects.filter(pk__in=ids).exclude(
+                pk=user.pk
+            ).values_list('pk', flat=True))
+            results = add_relations(user, Subscription, 'author', ids, targets)
+            for result in results:
+                if result['id'] == user.pk:
+                    result['status'] = 'self'
+        return Response({'results': results})
+
+
+def metrics(request):
+    """Метрики процесса в формате Prometheus."""
+    if not has_metrics_access(request):
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(
+        render_metrics(), content_type='text/plain; version=0.0.4'
+    )
@@ -32,6 +32,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -39,6 +40,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ReadYourWritesMiddleware',
 ]
 
 ROOT_URLCONF = 'backend_foodgram.urls'
@@ -76,9 +78,106 @@ else:
             'USER': os.getenv('POSTGRES_USER', 'django'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
             'HOST': os.getenv('DB_HOST', ''),
-            'PORT': os.getenv('DB_PORT', 5432)
+            'PORT': os.getenv('DB_PORT', 5432),
+            # Соединение остаётся открытым между запросами
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
         },
     }
+    if os.getenv('DB_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.getenv('DB_REPLICA_HOST'),
+            'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+            'TEST': {'MIRROR': 'default'},
+        }
+
+DATABASE_ROUTERS = ['api.db.ReplicaRouter']
+# Проверка постоянных соединений в начале запроса
+DB_CONN_HEALTH_CHECKS = os.getenv(
+    'DB_CONN_HEALTH_CHECKS', 'true'
+).lower() == 'true'
+# Сколько секунд соединение простаивает, прежде чем его проверять
+DB_CONN_HEALTH_CHECK_IDLE = int(os.getenv('DB_CONN_HEALTH_CHECK_IDLE', 30))
+# Сколько секунд после изменений пользователь читает с основной базы
+DB_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+# Кэш в памяти процесса не виден другим процессам: сброс в нём
+# не доходит до остальных воркеров
+SHARED_CACHE = not CACHES['default']['BACKEND'].endswith('LocMemCache')
+if not SHARED_CACHE:
+    # У LocMemCache по умолчанию 300 записей, фрагменты и версии
+    # рецептов вытесняли бы друг друга
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 100000)),
+    }
+
+CATALOGUE_CACHE_TIMEOUT = int(os.getenv('CATALOGUE_CACHE_TIMEOUT', 60 * 60))
+CATALOGUE_LOCAL_CACHE_SIZE = int(os.getenv('CATALOGUE_LOCAL_CACHE_SIZE', 256))
+CATALOGUE_LOCAL_CACHE_TTL = int(os.getenv('CATALOGUE_LOCAL_CACHE_TTL', 60))
+# Кэш ответов рецептов для анонимных пользователей: сколько секунд ответ
+# свежий, сколько ещё отдаётся устаревшим и время блокировки пересчёта
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 60))
+RESPONSE_CACHE_STALE_TIMEOUT = int(
+    os.getenv('RESPONSE_CACHE_STALE_TIMEOUT', 60 * 5)
+)
+RESPONSE_CACHE_LOCK_TIMEOUT = int(os.getenv('RESPONSE_CACHE_LOCK_TIMEOUT', 30))
+# Сколько секунд запрос ждёт ответ, который пересчитывает другой запрос
+RESPONSE_CACHE_LOCK_WAIT = float(os.getenv('RESPONSE_CACHE_LOCK_WAIT', 2))
+# Время жизни готовых фрагментов рецептов без флагов пользователя, с
+RECIPE_FRAGMENT_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_FRAGMENT_CACHE_TIMEOUT', 60 * 60 * 24)
+)
+# Время жизни версий справочников, рецептов и авторов, с; должно быть
+# больше времени жизни записей, которые помечены этими версиями
+CATALOGUE_VERSION_TIMEOUT = int(
+    os.getenv('CATALOGUE_VERSION_TIMEOUT', 60 * 60 * 48)
+)
+
+# Конфигурация полнотекстового поиска PostgreSQL
+RECIPE_SEARCH_CONFIG = os.getenv('RECIPE_SEARCH_CONFIG', 'russian')
+
+# Журнал изменений рецептов для индекса подбора по ингредиентам
+MATCHING_JOURNAL_TIMEOUT = int(os.getenv('MATCHING_JOURNAL_TIMEOUT', 60 * 60))
+# Сколько изменённых рецептов индекс держит до полной перестройки
+MATCHING_MAX_OVERRIDES = int(os.getenv('MATCHING_MAX_OVERRIDES', 10000))
+
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', 60 * 5))
+AUTH_TOKEN_LOCAL_CACHE_SIZE = int(
+    os.getenv('AUTH_TOKEN_LOCAL_CACHE_SIZE', 10000)
+)
+AUTH_TOKEN_LOCAL_TTL = int(os.getenv('AUTH_TOKEN_LOCAL_TTL', 60))
+
+# Сколько секунд хранятся id избранного, корзины и подписок пользователя
+RELATIONS_CACHE_TIMEOUT = int(os.getenv('RELATIONS_CACHE_TIMEOUT', 60 * 60))
+
+if not SHARED_CACHE:
+    # Сброс версий в LocMemCache виден только своему процессу,
+    # поэтому другие процессы отдают устаревшее не дольше этого срока
+    LOCAL_CACHE_MAX_TIMEOUT = int(os.getenv('LOCAL_CACHE_MAX_TIMEOUT', 60))
+    CATALOGUE_CACHE_TIMEOUT = min(
+        CATALOGUE_CACHE_TIMEOUT, LOCAL_CACHE_MAX_TIMEOUT
+    )
+    CATALOGUE_LOCAL_CACHE_TTL = min(
+        CATALOGUE_LOCAL_CACHE_TTL, LOCAL_CACHE_MAX_TIMEOUT
+    )
+    RESPONSE_CACHE_TIMEOUT = min(
+        RESPONSE_CACHE_TIMEOUT, LOCAL_CACHE_MAX_TIMEOUT
+    )
+    RESPONSE_CACHE_STALE_TIMEOUT = 0
+    RECIPE_FRAGMENT_CACHE_TIMEOUT = min(
+        RECIPE_FRAGMENT_CACHE_TIMEOUT, LOCAL_CACHE_MAX_TIMEOUT
+    )
+    RELATIONS_CACHE_TIMEOUT = min(
+        RELATIONS_CACHE_TIMEOUT, LOCAL_CACHE_MAX_TIMEOUT
+    )
 
 AUTH_USER_MODEL = 'recipes.User'
 
@@ -120,6 +219,25 @@ STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+DEFAULT_FILE_STORAGE = 'recipes.storage.ContentAddressedStorage'
+
+# Уменьшенные копии загруженных изображений: название -> наибольшая сторона
+IMAGE_RENDITIONS = {
+    'thumbnail': 320,
+    'feed': 960,
+}
+IMAGE_RENDITION_FORMAT = os.getenv('IMAGE_RENDITION_FORMAT', 'WEBP')
+IMAGE_RENDITION_QUALITY = int(os.getenv('IMAGE_RENDITION_QUALITY', 80))
+# Загруженный файл пересохраняется без EXIF и уменьшается до этой стороны
+IMAGE_ORIGINAL_MAX_SIZE = int(os.getenv('IMAGE_ORIGINAL_MAX_SIZE', 2048))
+IMAGE_ORIGINAL_QUALITY = int(os.getenv('IMAGE_ORIGINAL_QUALITY', 90))
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+# Запросы к БД дольше порога (мс) пишутся в лог вместе с SQL
+SLOW_QUERY_THRESHOLD = float(os.getenv('SLOW_QUERY_THRESHOLD', 200))
+# Если задан, /api/metrics/ требует заголовок Authorization: Bearer <token>
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -130,9 +248,18 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAdminUser',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.LimitPagination',
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 DJOSER = {
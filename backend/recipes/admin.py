@@ -19,11 +19,11 @@ class UserAdmin(BaseUserAdmin):
 
     @admin.display(description='Количество рецептов')
     def recipes_amount(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
     @admin.display(description='Количество подписчиков')
     def subscribers_amount(self, obj):
-        return obj.following.count()
+        return obj.followers_count
 
 
 @admin.register(Subscription)
@@ -83,7 +83,7 @@ class RecipeAdmin(admin.ModelAdmin):
     @admin.display(description='Добавлено в избранное')
     def favorite_count(self, obj):
         """Количество в избранном."""
-        return obj.favorites.count()
+        return obj.favorites_count
 
 
 @admin.register(Favorite, ShoppingCart)
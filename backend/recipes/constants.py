@@ -4,3 +4,23 @@ STR_SYMBOL_LIMIT = 20
 VALID_CHARACTERS_USERNAME = r'^[\w.@+-]+'
 MIN_COOKS_TIME = 1
 MAX_COOKS_TIME = 360
+INGREDIENTS_BATCH_SIZE = 1000
+INGREDIENTS_SEARCH_LIMIT = 50
+INGREDIENTS_SEARCH_MAX_LIMIT = 200
+# Сколько лучших совпадений отдаёт поиск рецептов без PostgreSQL
+RECIPE_SEARCH_MAX_RESULTS = 200
+# Сколько рецептов отдаёт подбор по ингредиентам
+RECIPE_MATCHING_LIMIT = 20
+RECIPE_MATCHING_MAX_LIMIT = 100
+RECIPE_MATCHING_MAX_INGREDIENTS = 100
+# Страница ингредиентов, если передан page или limit
+INGREDIENTS_PAGE_SIZE = 100
+INGREDIENTS_PAGE_MAX_SIZE = 1000
+# Сколько дней хранятся удаления для снимка ингредиентов
+INGREDIENTS_TOMBSTONE_DAYS = 30
+# Изменения снимка отдаются с запасом на ещё не зафиксированные транзакции
+INGREDIENTS_SNAPSHOT_OVERLAP = 60
+# Файлы моложе стольких секунд могут принадлежать незавершённой записи
+MEDIA_MIN_AGE = 60 * 60
+# Сколько id принимают массовые избранное, покупки и подписки
+BULK_RELATIONS_MAX_IDS = 500
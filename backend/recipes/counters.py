@@ -0,0 +1,60 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart, Subscription, User
+
+# (модель, поле счётчика, связанная модель, внешний ключ на модель)
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'shopping_cart_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'author'),
+)
+
+# Сигналы не меняют счётчики, пока идёт массовая операция.
+counters_suspended = ContextVar('counters_suspended', default=False)
+
+
+@contextmanager
+def suspend_counters():
+    """Массовое удаление без UPDATE счётчика на каждую запись;
+    затем счётчики пересчитываются через recount_counters."""
+    token = counters_suspended.set(True)
+    try:
+        yield
+    finally:
+        counters_suspended.reset(token)
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарное изменение счётчика на уровне базы данных."""
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def count_expression(related_model, foreign_key):
+    """Подзапрос с фактическим количеством связанных записей."""
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(
+                **{foreign_key: OuterRef('pk')}
+            ).order_by().values(foreign_key).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def recount_counters(related_model, pks):
+    """Точные счётчики объектов pks одним UPDATE на каждый счётчик."""
+    for model, field, related, foreign_key in COUNTERS:
+        if related is related_model:
+            model.objects.filter(pk__in=pks).update(
+                **{field: count_expression(related, foreign_key)}
+            )
@@ -0,0 +1,84 @@
+import posixpath
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from recipes.constants import MEDIA_MIN_AGE
+from recipes.models import Recipe, User
+
+# Поле файла и поле с путями его уменьшенных копий.
+MEDIA_FIELDS = (
+    (Recipe, 'image', 'image_renditions'),
+    (User, 'avatar', 'avatar_renditions'),
+)
+
+
+def get_references():
+    """Количество ссылок на каждый файл из записей базы."""
+    references = {}
+    for model, field_name, renditions_field in MEDIA_FIELDS:
+        rows = model.objects.values_list(
+            field_name, renditions_field
+        ).iterator()
+        for name, renditions in rows:
+            for path in (name, *(renditions or {}).values()):
+                if path:
+                    references[path] = references.get(path, 0) + 1
+    return references
+
+
+def walk(storage, directory):
+    """Все файлы каталога хранилища, включая вложенные."""
+    directories, files = storage.listdir(directory)
+    for file_name in files:
+        yield posixpath.join(directory, file_name)
+    for name in directories:
+        yield from walk(storage, posixpath.join(directory, name))
+
+
+class Command(BaseCommand):
+    """Удаление медиафайлов, на которые не ссылается ни одна запись."""
+
+    help = 'Сборка мусора в MEDIA_ROOT по количеству ссылок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать файлы без ссылок'
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=MEDIA_MIN_AGE,
+            help='Не трогать файлы моложе указанного числа секунд'
+        )
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        threshold = time.time() - options['min_age']
+        references = get_references()
+        directories = {
+            model._meta.get_field(field_name).upload_to.strip('/')
+            for model, field_name, _ in MEDIA_FIELDS
+        }
+        removed = size = 0
+        for directory in sorted(directories):
+            if not storage.exists(directory):
+                continue
+            for path in walk(storage, directory):
+                if references.get(path):
+                    continue
+                # Свежий файл может принадлежать незавершённой записи.
+                if storage.get_modified_time(path).timestamp() > threshold:
+                    continue
+                size += storage.size(path)
+                removed += 1
+                if options['dry_run']:
+                    self.stdout.write(path)
+                else:
+                    storage.delete(path)
+        action = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов без ссылок: {removed}, '
+            f'{size / 1024 / 1024:.1f} МБ; '
+            f'файлов со ссылками: {len(references)}'
+        ))
@@ -0,0 +1,205 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Subscription, Tag, User)
+from recipes.signals import recipes_imported
+
+# Словарь для названий и описаний, чтобы по ним можно было искать.
+WORDS = (
+    'суп', 'борщ', 'салат', 'пирог', 'каша', 'омлет', 'паста', 'плов',
+    'котлеты', 'блины', 'запеканка', 'рагу', 'соус', 'десерт', 'торт',
+    'курица', 'говядина', 'свинина', 'рыба', 'лосось', 'грибы', 'сыр',
+    'картофель', 'морковь', 'томаты', 'капуста', 'рис', 'гречка', 'тыква',
+    'яблоки', 'ягоды', 'шоколад', 'творог', 'сливки', 'чеснок', 'укроп',
+    'острый', 'сладкий', 'домашний', 'быстрый', 'постный', 'летний',
+    'запечь', 'обжарить', 'варить', 'тушить', 'нарезать', 'смешать',
+    'духовка', 'сковорода', 'кастрюля', 'минут', 'порция', 'ужин', 'обед',
+)
+
+
+@contextmanager
+def explicit_published_date():
+    """Отключение auto_now_add, чтобы задать даты публикации вручную."""
+    field = Recipe._meta.get_field('published_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Command(BaseCommand):
+    """Генерация синтетических данных для нагрузочных замеров."""
+
+    help = 'Заполнение базы синтетическими данными через bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--tags-per-recipe', type=int, default=2)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=6)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--carts-per-user', type=int, default=5)
+        parser.add_argument(
+            '--subscriptions-per-user', type=int, default=10
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = f'gen{int(time.time())}'
+        started = time.monotonic()
+        tags = self.create_tags(options['tags'])
+        ingredients = self.create_ingredients(options['ingredients'])
+        users = self.create_users(options['users'])
+        recipes = self.create_recipes(
+            options['recipes'], users, tags, ingredients,
+            options['tags_per_recipe'], options['ingredients_per_recipe']
+        )
+        for model, per_user in (
+            (Favorite, options['favorites_per_user']),
+            (ShoppingCart, options['carts_per_user']),
+        ):
+            self.create_relations(model, users, recipes, per_user)
+        self.create_subscriptions(users, options['subscriptions_per_user'])
+        call_command('recount_counters', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        recipes_imported.send(sender=self.__class__)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с'
+        ))
+
+    def bulk_create(self, model, objects, **kwargs):
+        for batch in batches(objects, self.batch_size):
+            model.objects.bulk_create(
+                batch, batch_size=self.batch_size, **kwargs
+            )
+        self.stdout.write(f'{model.__name__}: {len(objects)}')
+
+    def create_tags(self, count):
+        self.bulk_create(Tag, [
+            Tag(name=f'{self.prefix} тег {number}',
+                slug=f'{self.prefix}-tag-{number}')
+            for number in range(count)
+        ])
+        return list(Tag.objects.filter(
+            slug__startswith=self.prefix
+        ).values_list('id', flat=True))
+
+    def create_ingredients(self, count):
+        self.bulk_create(Ingredient, [
+            Ingredient(name=f'{self.prefix} ингредиент {number}',
+                       measurement_unit=self.random.choice(('г', 'мл', 'шт')))
+            for number in range(count)
+        ])
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def create_users(self, count):
+        password = make_password(self.prefix)
+        self.bulk_create(User, [
+            User(
+                username=f'{self.prefix}_user{number}',
+                email=f'{self.prefix}_user{number}@example.com',
+                first_name=f'Имя{number}',
+                last_name=f'Фамилия{number}',
+                password=password,
+            )
+            for number in range(count)
+        ])
+        return list(User.objects.filter(
+            username__startswith=self.prefix
+        ).values_list('id', flat=True))
+
+    def create_recipes(self, count, users, tags, ingredients,
+                       tags_per_recipe, ingredients_per_recipe):
+        now = timezone.now()
+        recipe_ids = []
+        for start in range(0, count, self.batch_size):
+            numbers = range(start, min(start + self.batch_size, count))
+            with explicit_published_date():
+                Recipe.objects.bulk_create([
+                    Recipe(
+                        author_id=self.random.choice(users),
+                        name=self.recipe_name(number),
+                        image='recipes/images/generated.png',
+                        text=' '.join(self.random.choices(
+                            WORDS, k=self.random.randint(8, 30)
+                        )),
+                        cooking_time=self.random.randint(1, 360),
+                        published_date=now - timedelta(seconds=number),
+                    )
+                    for number in numbers
+                ])
+            # SQLite не возвращает id из bulk_create, поэтому
+            # id созданной пачки читаются отдельным запросом.
+            ids = list(Recipe.objects.filter(
+                name__in=[self.recipe_name(number) for number in numbers]
+            ).values_list('id', flat=True))
+            Recipe.tags.through.objects.bulk_create([
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in ids
+                for tag_id in self.random.sample(
+                    tags, min(tags_per_recipe, len(tags))
+                )
+            ])
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=self.random.randint(1, 500),
+                )
+                for recipe_id in ids
+                for ingredient_id in self.random.sample(
+                    ingredients, min(ingredients_per_recipe, len(ingredients))
+                )
+            ])
+            recipe_ids.extend(ids)
+            self.stdout.write(f'Recipe: {len(recipe_ids)} из {count}')
+        return recipe_ids
+
+    def recipe_name(self, number):
+        """Уникальное название: два слова словаря и номер."""
+        first = WORDS[number % len(WORDS)]
+        second = WORDS[number // len(WORDS) % len(WORDS)]
+        return f'{first} {second} {self.prefix}-{number}'
+
+    def create_relations(self, model, users, recipes, per_user):
+        self.bulk_create(model, [
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in users
+            for recipe_id in self.random.sample(
+                recipes, min(per_user, len(recipes))
+            )
+        ], ignore_conflicts=True)
+
+    def create_subscriptions(self, users, per_user):
+        subscriptions = []
+        for user_id in users:
+            authors = [
+                author_id for author_id in self.random.sample(
+                    users, min(per_user + 1, len(users))
+                )
+                if author_id != user_id
+            ]
+            subscriptions.extend(
+                Subscription(user_id=user_id, author_id=author_id)
+                for author_id in authors[:per_user]
+            )
+        self.bulk_create(Subscription, subscriptions, ignore_conflicts=True)
@@ -1,24 +1,88 @@
 import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
-from recipes.constants import INGREDIENTS_PATH
+from recipes.constants import INGREDIENTS_BATCH_SIZE, INGREDIENTS_PATH
 from recipes.models import Ingredient
+from recipes.signals import ingredients_imported
+
+
+def read_csv(file):
+    for row in csv.reader(file, delimiter=','):
+        if len(row) == 2:
+            yield row
+
+
+def read_json(file):
+    for item in json.load(file):
+        yield item.get('name'), item.get('measurement_unit')
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
 
 
 class Command(BaseCommand):
     """Заполнение базы ингридиентами"""
 
-    help = 'Импорт данных из CSV-файлов в базу данных'
-    count = 0
+    help = 'Импорт ингредиентов из CSV- или JSON-файла в базу данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=INGREDIENTS_PATH,
+            help='Путь к файлу с ингредиентами'
+        )
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла, по умолчанию определяется по расширению'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=INGREDIENTS_BATCH_SIZE,
+            help='Количество строк в одном INSERT'
+        )
 
     def handle(self, *args, **options):
-        with open(INGREDIENTS_PATH, 'r', encoding='utf-8') as file:
-            reader = csv.reader(file, delimiter=',')
-            for string in reader:
-                name, measurement_unit = string
-                if name:
-                    Ingredient.objects.get_or_create(
-                        name=name,
-                        measurement_unit=measurement_unit
-                    )
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        total = 0
+        started = time.monotonic()
+        with open(path, 'r', encoding='utf-8') as file, transaction.atomic():
+            rows = (
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in READERS[file_format](file)
+                if name
+            )
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                Ingredient.objects.bulk_create(
+                    batch, batch_size=batch_size, ignore_conflicts=True
+                )
+                total += len(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'Обработано {total} строк, '
+                    f'{total / elapsed:.0f} строк/с'
+                )
+        ingredients_imported.send(sender=self.__class__)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершён: {total} строк '
+            f'за {time.monotonic() - started:.2f} с'
+        ))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from recipes.counters import COUNTERS, count_expression
+
+
+class Command(BaseCommand):
+    """Пересчёт денормализованных счётчиков."""
+
+    help = (
+        'Проверка и пересчёт счётчиков избранного, корзины, '
+        'рецептов и подписчиков'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить счётчики, не изменяя данные'
+        )
+
+    def handle(self, *args, **options):
+        mismatched = 0
+        with transaction.atomic():
+            for model, field, related_model, foreign_key in COUNTERS:
+                expected = count_expression(related_model, foreign_key)
+                wrong = model.objects.annotate(
+                    expected=expected
+                ).exclude(**{field: F('expected')})
+                count = wrong.count()
+                mismatched += count
+                self.stdout.write(
+                    f'{model.__name__}.{field}: расхождений {count}'
+                )
+                if count and not options['check']:
+                    model.objects.update(**{field: expected})
+        if options['check'] and mismatched:
+            self.stdout.write(self.style.ERROR(
+                f'Найдено расхождений: {mismatched}'
+            ))
+        elif options['check']:
+            self.stdout.write(self.style.SUCCESS('Счётчики корректны'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
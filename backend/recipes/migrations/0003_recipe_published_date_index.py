@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-18 05:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-published_date', '-id'], name='recipe_published_date_id'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2 on 2026-10-18 05:11
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+
+def remove_duplicate_carts(apps, schema_editor):
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    duplicates = ShoppingCart.objects.order_by().values(
+        'user', 'recipe'
+    ).annotate(first_id=Min('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicates:
+        ShoppingCart.objects.filter(
+            user=duplicate['user'], recipe=duplicate['recipe']
+        ).exclude(id=duplicate['first_id']).delete()
+        Recipe.objects.filter(pk=duplicate['recipe']).update(
+            shopping_cart_count=F('shopping_cart_count')
+            - (duplicate['total'] - 1)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_published_date_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_carts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='user_shopping_cart'),
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX recipe_tags_tag_recipe '
+            'ON recipes_recipe_tags (tag_id, recipe_id);',
+            'DROP INDEX recipe_tags_tag_recipe;',
+        ),
+    ]
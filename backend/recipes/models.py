@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import validate_email
 from django.db import models
 from django.db.models import F, Q
@@ -7,7 +8,29 @@ from django.db.models import F, Q
 from recipes.constants import NAME_MAX_LENGTH, STR_SYMBOL_LIMIT
 
 
-class User(AbstractUser):
+class CountersModel(models.Model):
+    """Модель со счётчиками, которые меняются только через UPDATE.
+
+    Сохранение загруженного ранее объекта не перезаписывает
+    счётчики устаревшими значениями.
+    """
+
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CountersModel, AbstractUser):
     """Пользователь."""
 
     email = models.EmailField(
@@ -30,6 +53,23 @@ class User(AbstractUser):
         blank=True,
         verbose_name='Аватар',
     )
+    avatar_renditions = models.JSONField(
+        'Уменьшенные копии аватара',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        editable=False
+    )
+    counter_fields = ('recipes_count', 'followers_count')
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = (
         'username',
@@ -112,6 +152,11 @@ class Ingredient(models.Model):
         'Единица измерения',
         max_length=NAME_MAX_LENGTH
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        db_index=True
+    )
 
     class Meta:
         verbose_name = 'Ингредиент'
@@ -130,7 +175,25 @@ class Ingredient(models.Model):
         )
 
 
-class Recipe(models.Model):
+class DeletedIngredient(models.Model):
+    """Удалённый ингредиент для изменений снимка справочника."""
+
+    ingredient_id = models.PositiveIntegerField('Ингредиент')
+    deleted_at = models.DateTimeField(
+        'Дата удаления',
+        auto_now_add=True,
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = 'Удалённый ингредиент'
+        verbose_name_plural = 'Удалённые ингредиенты'
+
+    def __str__(self):
+        return str(self.ingredient_id)
+
+
+class Recipe(CountersModel):
     """Рецепты."""
 
     author = models.ForeignKey(
@@ -150,6 +213,12 @@ class Recipe(models.Model):
         upload_to='recipes/images/',
         null=False
     )
+    image_renditions = models.JSONField(
+        'Уменьшенные копии изображения',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     text = models.TextField(
         'Описание рецепта'
     )
@@ -169,12 +238,30 @@ class Recipe(models.Model):
         'Время приготовления',
         null=False
     )
+    favorites_count = models.PositiveIntegerField(
+        'Добавлено в избранное',
+        default=0,
+        editable=False
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        'Добавлено в корзину',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+    counter_fields = ('favorites_count', 'shopping_cart_count')
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         default_related_name = 'recipes'
         ordering = ('-published_date',)
+        indexes = [
+            models.Index(
+                fields=('-published_date', '-id'),
+                name='recipe_published_date_id'
+            )
+        ]
 
     def __str__(self):
         return self.name[:STR_SYMBOL_LIMIT]
@@ -253,6 +340,12 @@ class ShoppingCart(FavoriteShoppingCart):
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Список покупок'
         default_related_name = 'shopping_cart'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='user_shopping_cart'
+            )
+        ]
 
     def __str__(self):
         return f'{self.recipe.name[:STR_SYMBOL_LIMIT]} в корзине у {self.user}'
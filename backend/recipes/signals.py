@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+from django.utils import timezone
+
+from recipes.constants import INGREDIENTS_TOMBSTONE_DAYS
+from recipes.counters import COUNTERS, change_counter, counters_suspended
+from recipes.models import DeletedIngredient, Ingredient, Recipe, User
+from recipes.storage import release_file
+
+# Отправляется после массовой загрузки ингредиентов,
+# которая не вызывает post_save для отдельных объектов.
+ingredients_imported = Signal()
+# То же для рецептов, созданных через bulk_create.
+recipes_imported = Signal()
+# Копии изображения сохранены через update(), без post_save; аргумент pk.
+renditions_updated = Signal()
+
+
+def update_counter(sender, instance, signal, created=False, **kwargs):
+    """Изменение счётчика при создании или удалении связанной записи."""
+    if (signal is post_save and not created) or counters_suspended.get():
+        return
+    model, field, foreign_key = COUNTED_MODELS[sender]
+    change_counter(
+        model, getattr(instance, f'{foreign_key}_id'), field,
+        1 if created else -1
+    )
+
+
+COUNTED_MODELS = {
+    related_model: (model, field, foreign_key)
+    for model, field, related_model, foreign_key in COUNTERS
+}
+
+for related_model in COUNTED_MODELS:
+    post_save.connect(update_counter, sender=related_model)
+    post_delete.connect(update_counter, sender=related_model)
+
+
+def release_image(sender, instance, **kwargs):
+    """Освобождение изображения удалённой записи."""
+    release_file(getattr(instance, IMAGE_FIELDS[sender]).name)
+
+
+IMAGE_FIELDS = {Recipe: 'image', User: 'avatar'}
+
+for model in IMAGE_FIELDS:
+    post_delete.connect(release_image, sender=model)
+
+
+def record_deleted_ingredient(sender, instance, **kwargs):
+    """Запись об удалении для клиентов со снимком ингредиентов."""
+    DeletedIngredient.objects.create(ingredient_id=instance.pk)
+    DeletedIngredient.objects.filter(
+        deleted_at__lt=timezone.now() - timedelta(
+            days=INGREDIENTS_TOMBSTONE_DAYS
+        )
+    ).delete()
+
+
+post_delete.connect(record_deleted_ingredient, sender=Ingredient)
@@ -0,0 +1,83 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+
+
+class HashedContentFile(ContentFile):
+    """Содержимое файла с уже посчитанным sha256."""
+
+    def __init__(self, content, name, digest):
+        super().__init__(content, name)
+        self.digest = digest
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище с именами по хешу содержимого.
+
+    Файл с тем же содержимым сохраняется один раз: повторная запись
+    возвращает имя уже существующего файла и обновляет время его
+    изменения, чтобы cleanup_media не удалила его как старый. Хеш
+    HashedContentFile не пересчитывается.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = getattr(content, 'digest', None)
+        if digest is None:
+            hasher = hashlib.sha256()
+            for chunk in content.chunks():
+                hasher.update(chunk)
+            content.seek(0)
+            digest = hasher.hexdigest()
+        directory, file_name = posixpath.split(name)
+        extension = posixpath.splitext(file_name)[1].lower()
+        name = posixpath.join(directory, digest + extension)
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return super().save(name, content, max_length)
+        # Другая запись могла освободить файл до фиксации этой.
+        transaction.on_commit(lambda: self.restore(name, content))
+        return name
+
+    def restore(self, name, content):
+        """Повторная запись файла, удалённого release_file."""
+        if self.exists(name):
+            return
+        content.seek(0)
+        super().save(name, content)
+
+
+def count_references(name):
+    """Количество записей, которые ссылаются на файл."""
+    from recipes.models import Recipe, User
+
+    return (
+        Recipe.objects.filter(image=name).count()
+        + User.objects.filter(avatar=name).count()
+    )
+
+
+def release_file(name):
+    """Удаление файла после коммита, если на него больше нет ссылок.
+
+    Запись, которая в это время сохраняет то же содержимое, после
+    своего коммита записывает файл заново. Уменьшенные копии удаляет
+    команда cleanup_media.
+    """
+    if not name:
+        return
+
+    def delete():
+        if not count_references(name):
+            default_storage.delete(name)
+
+    transaction.on_commit(delete)